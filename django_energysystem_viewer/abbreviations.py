@@ -0,0 +1,93 @@
+"""Lookup and prefix search of abbreviations used in SEDOS process and commodity names."""
+
+import bisect
+from itertools import chain
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from django_energysystem_viewer import structures
+
+# Maximum number of abbreviations returned by a single autocomplete request
+MAX_COMPLETIONS = 50
+# Maximum number of names decoded by a single request
+MAX_DECODE_NAMES = 500
+
+
+class AbbreviationIndex:
+    """
+    Index of abbreviations and their meanings for constant time lookup and logarithmic prefix search.
+
+    Methods
+    ----------
+    __init__(abbreviations: pd.DataFrame)
+        Builds the index from the Abbreviations sheet with columns "abbreviations" and "meaning".
+    lookup(abbreviation)
+        Returns the meaning of an abbreviation or None if it is unknown.
+    complete(prefix, limit)
+        Returns up to limit abbreviations starting with the given prefix (case-insensitive) in alphabetical order.
+    decode(names)
+        Splits process or commodity names at underscores and returns the meaning of every part.
+    """
+
+    def __init__(self, abbreviations: pd.DataFrame):
+        self.meanings: Dict[str, str] = {}
+        for abbreviation, meaning in zip(abbreviations["abbreviations"], abbreviations["meaning"]):
+            # First occurrence wins, if an abbreviation is listed twice
+            self.meanings.setdefault(str(abbreviation), "" if pd.isna(meaning) else str(meaning))
+        # Abbreviations in order of the sheet, as shown in abbreviation lists
+        self.abbreviations: List[str] = list(self.meanings)
+        self._sorted = sorted(self.meanings, key=str.lower)
+        self._sorted_lower = [abbreviation.lower() for abbreviation in self._sorted]
+
+    def __len__(self) -> int:
+        return len(self.meanings)
+
+    def lookup(self, abbreviation: str) -> Optional[str]:
+        return self.meanings.get(abbreviation)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        prefix = prefix.lower()
+        matches = []
+        for i in range(bisect.bisect_left(self._sorted_lower, prefix), len(self._sorted)):
+            if len(matches) >= limit or not self._sorted_lower[i].startswith(prefix):
+                break
+            matches.append({"abbreviation": self._sorted[i], "meaning": self.meanings[self._sorted[i]]})
+        return matches
+
+    def decode(self, names: List[str]) -> Dict[str, List[Dict[str, Optional[str]]]]:
+        parts = {name: name.split("_") for name in dict.fromkeys(names)}
+        # Every distinct abbreviation is looked up only once, no matter how many names share it
+        meanings = {part: self.meanings.get(part) for part in set(chain.from_iterable(parts.values()))}
+        return {
+            name: [{"abbreviation": part, "meaning": meanings[part]} for part in name_parts]
+            for name, name_parts in parts.items()
+        }
+
+
+def get_abbreviation_index(structure_name: str) -> AbbreviationIndex:
+    """Returns the abbreviation index of a structure, built once per workbook version."""
+    return structures.get_derived(
+        structure_name,
+        "abbreviation_index",
+        lambda: AbbreviationIndex(structures.read_sheet(structure_name, structures.ABBREVIATIONS)),
+    )
+
+
+def decode_names(structure_name: str, names: List[str]) -> Dict[str, List[Dict[str, Optional[str]]]]:
+    """
+    Decodes process and commodity names into the meanings of their underscore-separated abbreviations.
+
+    Parameters
+    ----------
+    structure_name: str
+        Name of the structure holding the abbreviations.
+    names: list
+        Process or commodity names, like "ind_steel_boiler_coal_1".
+
+    Returns
+    -------
+    dict
+        For each name the list of its parts with their meaning, which is None for unknown abbreviations.
+    """
+    return get_abbreviation_index(structure_name).decode(names)
@@ -1,8 +1,21 @@
-from openpyxl import load_workbook
+from collections import deque
+from itertools import zip_longest
+
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook
+
+from django_energysystem_viewer.aggregation_tree import AggregationTree
+
+# Sectors offered on the aggregation page
+AGGREGATION_SECTORS = ["pow", "x2x", "hea", "ind", "tra"]
+# Levels of detail offered on the aggregation page, which are depths below the sector root
+AGGREGATION_LODS = [1, 2, 3]
 
 
-def generate_aggregation_graph(df_aggregation_mapping, sectors, lod, process_list):
+def generate_aggregation_graph(
+    df_aggregation_mapping, sectors, lod, process_list, aggregation_tree=None, collapsed_nodes=None
+):
     """Generates the aggregation graph as a dash component using the functions below.
 
     Parameters
@@ -13,81 +26,53 @@ def generate_aggregation_graph(df_aggregation_mapping, sectors, lod, process_lis
         The sector to filter the aggregation levels.
     lod: int
         The desired level of detail.
+    aggregation_tree: AggregationTree
+        Prebuilt index of the aggregation mapping, built from df_aggregation_mapping if not given.
+    collapsed_nodes: list
+        Ids of nodes whose descendants are hidden.
 
     Returns
     -------
     list
         The aggregation graph elements (nodes and edges).
     """
-    collapsed_nodes = []
     sector = sectors
 
-    nodes, edges = generate_elements(df_aggregation_mapping, lod, sector, process_list)
-    elements = elements_after_collapse(collapsed_nodes, nodes, edges)
+    nodes, edges = generate_elements(df_aggregation_mapping, lod, sector, process_list, aggregation_tree)
+    elements = AggregationElements(nodes, edges, sector).visible(collapsed_nodes or [])
 
     return elements
 
 
-def get_aggregation_level(target_value: int, df: pd.DataFrame) -> list:
-    """
-    Returns a list of all processes of one aggregation level.
-
-    Parameters
-    ----------
-    target_value: int
-        The target value to compare.
-    df: pd.DataFrame
-        The DataFrame of the Model Structure.
-
-    Returns
-    -------
-    list
-        The list of elements of the corresponding aggregation level.
-    """
-    elements = []
-
-    for _, row in df.iterrows():
-        for idx in range(2):
-            compare_cell_value = row.iloc[idx + 2]
-            if compare_cell_value == target_value:
-                elements.append(row.iloc[idx])
-
-    # Remove duplicates while preserving order
-    return list(dict.fromkeys(elements))
+def calc_positions(aggregation_levels):
+    """Assigns the positions of all nodes according to their aggregation level.
 
-def calc_pos(node, aggregation_levels, level_of_detail):
-    """Assigns the position of a node according to its aggregation level.
+    A node listed in several aggregation levels is placed at the first of them in order of the dictionary.
 
     Parameters
     ----------
-    node: str
-        The node for which a position should be assigned.
     aggregation_levels: dict
         The dictionary of filtered aggregation levels.
-    level_of_detail: int
-        The desired level of detail.
 
     Returns
     -------
-    int
-        The x-coordinate of the node.
-    int
-        The y-coordinate of the node.
+    dict
+        The x- and y-coordinate per node.
     """
     scaling_factor_x = 2000
     scaling_factor_y = 150
 
+    positions = {}
     for level, processes in aggregation_levels.items():
-        if node in processes:
-            N = len(processes)
-            span = N * scaling_factor_y
-            y = processes.index(node) * scaling_factor_y - span / 2
-            x = (4 - level) * scaling_factor_x
-            return x, y
-    return 0, 0
+        N = len(processes)
+        span = N * scaling_factor_y
+        x = (4 - level) * scaling_factor_x
+        for index, node in enumerate(processes):
+            positions.setdefault(node, (x, index * scaling_factor_y - span / 2))
+    return positions
 
 
-def generate_elements(df_aggregation_mapping, level_of_detail, sector, process_list):
+def generate_elements(df_aggregation_mapping, level_of_detail, sector, process_list, aggregation_tree=None):
     """Generates the nodes and edges of the aggregation graph.
 
     Parameters
@@ -98,6 +83,8 @@ def generate_elements(df_aggregation_mapping, level_of_detail, sector, process_l
         The desired level of detail.
     sector: str
         The sector to filter the aggregation levels.
+    aggregation_tree: AggregationTree
+        Prebuilt index of the aggregation mapping, built from df_aggregation_mapping if not given.
 
     Returns
     -------
@@ -106,30 +93,24 @@ def generate_elements(df_aggregation_mapping, level_of_detail, sector, process_l
     list
         The list of all edges.
     """
-    lod_levels = [3, 2, 1, 0]
-    aggregation_levels = {}
-    none_items = []
-    for n in lod_levels:
-        aggregation_levels[n] = []
-        for item in get_aggregation_level(n, df_aggregation_mapping):
-            if item is None:
-                none_items.append(item)
-            elif item.startswith(sector):
-                aggregation_levels[n].append(item)
-    # print("Count of None items:", len(none_items))
+    if aggregation_tree is None:
+        aggregation_tree = AggregationTree(df_aggregation_mapping)
+    aggregation_levels = {level: list(items) for level, items in aggregation_tree.sector_levels(sector).items()}
     agg_list = sum(aggregation_levels.values(), [])
-    process_list_sector = [item for item in process_list if item.startswith(sector)]
+    agg_set = set(agg_list)
 
     # Those processes which are in the Process_Set but are not in the Aggregation_Mapping are added to the list
-    no_agg_list = list(set(process_list_sector) - set(agg_list))
+    no_agg_list = [item for item in dict.fromkeys(process_list) if item.startswith(sector) and item not in agg_set]
     aggregation_levels[0] = aggregation_levels[0] + no_agg_list
     agg_list = agg_list + no_agg_list
     nodes = create_nodes(agg_list, aggregation_levels, level_of_detail)
-    edges = create_edges(df_aggregation_mapping, agg_list, sector, nodes, aggregation_levels, level_of_detail)
+    edges = create_edges(aggregation_tree, agg_list, sector, nodes, aggregation_levels, level_of_detail)
     return nodes, edges
 
-def generate_df_lod(df_aggregation_mapping, lod, process_list):
-    """Returns a dataframe where columns denote sectors and rows its related processes for a chosen level of detail (lod).
+
+def generate_df_lod(df_aggregation_mapping, lod, process_list, aggregation_tree=None):
+    """Returns a dataframe where columns denote sectors and rows its related processes for a chosen level of detail
+    (lod).
 
     Parameters
     ----------
@@ -139,6 +120,8 @@ def generate_df_lod(df_aggregation_mapping, lod, process_list):
         The level of detail chosen by the user.
     process_list: list
         The list of all processes from the Process_Set.
+    aggregation_tree: AggregationTree
+        Prebuilt index of the aggregation mapping, built from df_aggregation_mapping if not given.
 
     Returns
     -------
@@ -146,15 +129,46 @@ def generate_df_lod(df_aggregation_mapping, lod, process_list):
         All processes for a certain level of detail.
     """
     df_lod = pd.DataFrame()
+    if aggregation_tree is None:
+        aggregation_tree = AggregationTree(df_aggregation_mapping)
 
-    sectors = ["pow", "x2x", "hea", "ind", "tra"]
-    for sector in sectors:
-        nodes, edges = generate_elements(df_aggregation_mapping, lod, sector, process_list)
-        edge_sources_list = [item['data']['source'] for item in edges]
-        lod_list = [item['data']['id'] for item in nodes if item['data']['id'] not in edge_sources_list]
+    for sector in AGGREGATION_SECTORS:
+        nodes, edges = generate_elements(df_aggregation_mapping, lod, sector, process_list, aggregation_tree)
+        lod_list = AggregationElements(nodes, edges, sector).leaf_processes()
         df_lod = pd.concat([df_lod, pd.Series(lod_list, name=sector)], axis=1)
     return df_lod
 
+
+def write_lod_workbook(file, aggregation_elements, lods=AGGREGATION_LODS):
+    """Writes the processes of all sectors into an Excel workbook, optionally with a sheet per level of detail.
+
+    The first sheet "processes" lists all processes which are not aggregated any further, like the dataframe of
+    generate_df_lod. Sheets "lod_<lod>" follow for the given levels of detail, see AggregationElements.lod_processes.
+    Every sheet has a column per sector. The workbook is written in openpyxl's write-only mode, which streams rows to
+    the file instead of keeping cells in memory.
+
+    Parameters
+    ----------
+    file: file-like object or str
+        The file the workbook is saved to.
+    aggregation_elements: dict
+        The aggregation elements per sector, see AggregationElements.
+    lods: list
+        The levels of detail to write a sheet for.
+    """
+    workbook = Workbook(write_only=True)
+    sheets = {"processes": lambda elements: elements.leaf_processes()}
+    for lod in lods:
+        sheets[f"lod_{lod}"] = lambda elements, lod=lod: elements.lod_processes(lod)
+    for name, get_processes in sheets.items():
+        sheet = workbook.create_sheet(name)
+        sheet.append(list(aggregation_elements))
+        columns = [get_processes(elements) for elements in aggregation_elements.values()]
+        for row in zip_longest(*columns):
+            sheet.append(row)
+    workbook.save(file)
+
+
 def create_nodes(agg_list, aggregation_levels, level_of_detail):
     """Creates the nodes for the aggregation graph.
 
@@ -173,32 +187,32 @@ def create_nodes(agg_list, aggregation_levels, level_of_detail):
         The list of nodes.
     """
     nodes = []
+    positions = calc_positions(aggregation_levels)
+    # The class is taken from the last aggregation level listing the node
+    node_levels = {node: level for level, processes in aggregation_levels.items() for node in processes}
 
     for node in agg_list:
-        x, y = calc_pos(node, aggregation_levels, level_of_detail)
-        nodes.append({
-            "data": {"id": node, "label": node},
-            "position": {"x": x, "y": y},
-            "classes": "",
-            "collapsible": False,
-            "level_of_detail": -1,
-        })
-
-    for node in nodes:
-        for level, processes in aggregation_levels.items():
-            if node["data"]["id"] in processes:
-                node["classes"] = f"aggregation_level_{level}"
+        x, y = positions.get(node, (0, 0))
+        nodes.append(
+            {
+                "data": {"id": node, "label": node},
+                "position": {"x": x, "y": y},
+                "classes": f"aggregation_level_{node_levels[node]}" if node in node_levels else "",
+                "collapsible": False,
+                "level_of_detail": -1,
+            }
+        )
 
     return nodes
 
 
-def create_edges(df_aggregation_mapping, agg_list, sector, nodes, aggregation_levels, level_of_detail):
+def create_edges(aggregation_tree, agg_list, sector, nodes, aggregation_levels, level_of_detail):
     """Creates the edges for the aggregation graph.
 
     Parameters
     ----------
-    df_aggregation_mapping: Dataframe
-        The dataframe with the aggregation mapping
+    aggregation_tree: AggregationTree
+        The index of the aggregation mapping
     process_list: list
         The list of all processes.
     sector: str
@@ -214,44 +228,43 @@ def create_edges(df_aggregation_mapping, agg_list, sector, nodes, aggregation_le
         The list of edges.
     """
     edges = []
+    agg_set = set(agg_list)
+    nodes_by_id = get_nodes_by_id(nodes)
 
-    for idx, row in df_aggregation_mapping.iterrows():
-        source = row.iloc[0]
-        target = row.iloc[1]
-
-        if source in agg_list and target in agg_list:
+    for source, target, explicit in aggregation_tree.edges:
+        if source in agg_set and target in agg_set:
             edges.append({"data": {"source": source, "target": target}})
-            for node in nodes:
-                if node["data"]["id"] == source:
-                    node["collapsible"] = True
-                    break
-        elif pd.isna(source) and not pd.isna(target):
-            i = idx - 1
-            while pd.isna(df_aggregation_mapping.iloc[i, 0]):
-                i -= 1
-            source = df_aggregation_mapping.iloc[i, 0]
-            if source in agg_list and target in agg_list:
-                edges.append({"data": {"source": source, "target": target}})
-
-    nodes.append({
-        "data": {"id": sector, "label": sector},
-        "position": {"x": 0, "y": 0},
-        "classes": "not-collapsed",
-        "collapsible": True,
-        "level_of_detail": 0,
-    })
-
+            # Only rows naming the aggregated process explicitly make it collapsible
+            if explicit:
+                nodes_by_id[source]["collapsible"] = True
+
+    nodes.append(
+        {
+            "data": {"id": sector, "label": sector},
+            "position": {"x": 0, "y": 0},
+            "classes": "not-collapsed",
+            "collapsible": True,
+            "level_of_detail": 0,
+        }
+    )
+
+    targets = {edge["data"]["target"] for edge in edges}
     for node in agg_list:
-        if not any(edge["data"]["target"] == node for edge in edges):
+        if node not in targets:
             edges.append({"data": {"source": sector, "target": node}})
+            targets.add(node)
 
     assign_levels(nodes, edges)
 
+    # The class is taken from the highest aggregation level listing the source
+    source_levels = {}
+    for level in range(3, 0, -1):
+        for process in aggregation_levels[level]:
+            source_levels.setdefault(process, level)
     for edge in edges:
-        for level in range(3, 0, -1):
-            if edge["data"]["source"] in aggregation_levels[level]:
-                edge["classes"] = f"aggregation_step_{level}"
-                break
+        level = source_levels.get(edge["data"]["source"])
+        if level is not None:
+            edge["classes"] = f"aggregation_step_{level}"
 
     return edges
 
@@ -259,6 +272,9 @@ def create_edges(df_aggregation_mapping, agg_list, sector, nodes, aggregation_le
 def assign_levels(nodes, edges):
     """Assign levels to nodes based on their connections.
 
+    Nodes with a level (the sector root) keep it and all nodes reachable from them get the number of edges on the
+    shortest path from them as level, in a single breadth-first search over the edges.
+
     Parameters
     ----------
     nodes: list
@@ -266,53 +282,153 @@ def assign_levels(nodes, edges):
     edges: list
         The list of edges.
     """
-    changed = True
-    while changed:
-        changed = False
-        for edge in edges:
-            source_node = next(node for node in nodes if node["data"]["id"] == edge["data"]["source"])
-            target_node = next(node for node in nodes if node["data"]["id"] == edge["data"]["target"])
-            if source_node["level_of_detail"] != -1 and target_node["level_of_detail"] != source_node["level_of_detail"] + 1:
-                target_node["level_of_detail"] = source_node["level_of_detail"] + 1
-                changed = True
+    nodes_by_id = get_nodes_by_id(nodes)
+    children = get_children(edges)
+    queue = deque(node_id for node_id, node in nodes_by_id.items() if node["level_of_detail"] != -1)
+    while queue:
+        source = queue.popleft()
+        level = nodes_by_id[source]["level_of_detail"] + 1
+        for target in children.get(source, []):
+            target_node = nodes_by_id[target]
+            if target_node["level_of_detail"] == -1:
+                target_node["level_of_detail"] = level
+                queue.append(target)
+
+
+def get_nodes_by_id(nodes):
+    """Returns the first node per id, nodes listed in several aggregation levels appear more than once."""
+    nodes_by_id = {}
+    for node in nodes:
+        nodes_by_id.setdefault(node["data"]["id"], node)
+    return nodes_by_id
 
 
-def elements_after_collapse(collapsed_nodes, nodes, edges):
-    """Creates the list of all nodes and edges after collapsing the children of the selected node.
+def get_children(edges):
+    """Returns the targets of all edges per source in order of the edges."""
+    children = {}
+    for edge in edges:
+        children.setdefault(edge["data"]["source"], []).append(edge["data"]["target"])
+    return children
 
-    Parameters
-    ----------
-    collapsed_nodes: list
-        The list of all collapsed nodes.
-    nodes: list
-        The list of all nodes.
-    edges: list
-        The list of all edges.
 
-    Returns
-    -------
-    list
-        The list of all nodes and edges after collapsing the children of the selected node.
+class AggregationElements:
+    """
+    Nodes and edges of an aggregation graph with the subtree range of every node for collapsing branches.
+
+    Nodes are numbered in depth-first order from the sector root (Euler tour), so that the descendants of a node are
+    exactly the nodes numbered within its range. Hiding the descendants of collapsed nodes marks their ranges only,
+    instead of walking their subtrees.
+
+    Methods
+    ----------
+    __init__(nodes, edges, root)
+        Numbers the nodes reachable from the root, see generate_elements.
+    visible(collapsed_nodes)
+        Returns the elements left after hiding the descendants of the given nodes.
+    delta(shown_collapsed_nodes, collapsed_nodes)
+        Returns the changes from the elements shown with one set of collapsed nodes to those of another.
+    leaf_processes()
+        Returns the processes which are not aggregated any further.
+    lod_processes(lod)
+        Returns the processes making up the sector at the given level of detail.
     """
-    nodes_after_collapse = nodes[:]
-    edges_after_collapse = edges[:]
-
-    def remove_children(node_id):
-        for edge in edges_after_collapse[:]:
-            if edge["data"]["source"] == node_id:
-                edges_after_collapse.remove(edge)
-                remove_children(edge["data"]["target"])
-                child_node = next((node for node in nodes_after_collapse if node["data"]["id"] == edge["data"]["target"]), None)
-                if child_node:
-                    nodes_after_collapse.remove(child_node)
-
-    for node in collapsed_nodes:
-        remove_children(node)
-
-    for node in nodes_after_collapse:
-        if node["data"]["id"] in collapsed_nodes and node["collapsible"]:
-            node["classes"] += " collapsed"
-        else:
-            node["classes"] += " not-collapsed"
-
-    return nodes_after_collapse + edges_after_collapse
\ No newline at end of file
+
+    def __init__(self, nodes, edges, root):
+        self.nodes = nodes
+        self.edges = edges
+        children = get_children(edges)
+        self.aggregated = set(children)
+        # Position in depth-first order and end of the subtree range (exclusive) per node id
+        self.start = {}
+        self.end = {}
+        stack = [(root, False)]
+        while stack:
+            node_id, finished = stack.pop()
+            if finished:
+                self.end[node_id] = len(self.start)
+                continue
+            if node_id in self.start:
+                continue
+            self.start[node_id] = len(self.start)
+            stack.append((node_id, True))
+            stack.extend((child, False) for child in reversed(children.get(node_id, [])))
+
+    def visible(self, collapsed_nodes):
+        """Returns the nodes and edges which are not descendants of collapsed nodes, nodes are copied."""
+        collapsed = {node_id for node_id in collapsed_nodes if node_id in self.start}
+        depth = np.zeros(len(self.start) + 1, dtype=np.int32)
+        for node_id in collapsed:
+            depth[self.start[node_id] + 1] += 1
+            depth[self.end[node_id]] -= 1
+        hidden = np.cumsum(depth) > 0
+
+        elements = []
+        for node in self.nodes:
+            node_id = node["data"]["id"]
+            position = self.start.get(node_id)
+            if position is not None and hidden[position]:
+                continue
+            suffix = " collapsed" if node_id in collapsed and node["collapsible"] else " not-collapsed"
+            elements.append({**node, "classes": node["classes"] + suffix})
+        for edge in self.edges:
+            source = edge["data"]["source"]
+            position = self.start.get(source)
+            if source in collapsed or (position is not None and hidden[position]):
+                continue
+            elements.append(edge)
+        return elements
+
+    def delta(self, shown_collapsed_nodes, collapsed_nodes):
+        """
+        Returns the elements to add, remove and restyle to get from the elements visible with the shown collapsed
+        nodes to those visible with the given collapsed nodes.
+
+        Removed nodes are given by id and removed edges by source and target, restyled nodes by id and their new
+        classes. Edges of removed nodes are left out, as they are removed along with their nodes. Added elements
+        include their positions, so that the client does not need to lay them out.
+        """
+        shown = {element_key(element): element for element in self.visible(shown_collapsed_nodes)}
+        current = {element_key(element): element for element in self.visible(collapsed_nodes)}
+        removed = [key for key in shown if key not in current]
+        removed_nodes = {key for key in removed if isinstance(key, str)}
+        return {
+            "add": [element for key, element in current.items() if key not in shown],
+            "remove": [
+                dict(shown[key]["data"])
+                for key in removed
+                if isinstance(key, str) or not (key[0] in removed_nodes or key[1] in removed_nodes)
+            ],
+            "restyle": [
+                {"id": element["data"]["id"], "classes": element["classes"]}
+                for key, element in current.items()
+                if key in shown and "id" in element["data"] and element["classes"] != shown[key]["classes"]
+            ],
+        }
+
+    def leaf_processes(self):
+        """Returns the ids of all nodes which are not aggregated any further, in order of the nodes."""
+        return [node["data"]["id"] for node in self.nodes if node["data"]["id"] not in self.aggregated]
+
+    def lod_processes(self, lod):
+        """
+        Returns the processes of the sector at the given level of detail in order of the nodes.
+
+        The level of detail of a node is its depth below the sector root. These are the nodes at the level of detail
+        and the processes above it which are not aggregated any further. Processes deeper than the level of detail
+        are represented by their aggregation at the level of detail instead, so only the level of detail of the
+        deepest process lists the same processes as leaf_processes.
+        """
+        processes = {}
+        for node in self.nodes:
+            node_id = node["data"]["id"]
+            level = node["level_of_detail"]
+            # The sector root (level 0) is no process, unreachable processes (level -1) have no known depth
+            if level == lod or (level != 0 and level < lod and node_id not in self.aggregated):
+                processes[node_id] = None
+        return list(processes)
+
+
+def element_key(element):
+    """Returns the id of a node or source and target of an edge, which identify elements of an aggregation graph."""
+    data = element["data"]
+    return data["id"] if "id" in data else (data["source"], data["target"])
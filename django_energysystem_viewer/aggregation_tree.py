@@ -0,0 +1,68 @@
+"""Index of the Aggregation_Mapping sheet, which holds the aggregation hierarchy of processes."""
+
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+LOD_LEVELS = [3, 2, 1, 0]
+
+
+class AggregationTree:
+    """
+    Aggregation hierarchy of processes, built once from the Aggregation_Mapping sheet.
+
+    The sheet is accessed by position: aggregated process, mapped process and their aggregation levels. The
+    aggregated process is only given in the first of its rows, following rows leave it empty and inherit it.
+
+    Attributes
+    ----------
+    edges: list
+        Tuples of aggregated process, mapped process and whether the aggregated process was given explicitly in the
+        row, in order of the sheet.
+    parents: dict
+        Aggregated process per mapped process, the first mapping wins.
+    children: dict
+        Mapped processes per aggregated process in order of the sheet.
+    levels: dict
+        Processes per aggregation level in order of the sheet, like get_aggregation_level.
+
+    Methods
+    ----------
+    __init__(df_aggregation_mapping: pd.DataFrame)
+        Builds the tree from the Aggregation_Mapping sheet.
+    sector_levels(sector)
+        Returns the processes per aggregation level which start with the sector's name.
+    """
+
+    def __init__(self, df_aggregation_mapping: pd.DataFrame):
+        given = df_aggregation_mapping.iloc[:, 0]
+        sources = given.ffill()
+        targets = df_aggregation_mapping.iloc[:, 1]
+        source_levels = df_aggregation_mapping.iloc[:, 2]
+        target_levels = df_aggregation_mapping.iloc[:, 3]
+
+        self.edges: List[Tuple[str, str, bool]] = []
+        self.parents: Dict[str, str] = {}
+        self.children: Dict[str, List[str]] = {}
+        mask = sources.notna() & targets.notna()
+        for source, target, explicit in zip(sources[mask], targets[mask], given[mask].notna()):
+            self.edges.append((source, target, bool(explicit)))
+            self.parents.setdefault(target, source)
+            self.children.setdefault(source, []).append(target)
+
+        levels: Dict[int, Dict[str, None]] = {level: {} for level in LOD_LEVELS}
+        for source, target, source_level, target_level in zip(given, targets, source_levels, target_levels):
+            for name, level in ((source, source_level), (target, target_level)):
+                # Levels may be read as floats, which equal and hash like their integers
+                if isinstance(name, str) and level in levels:
+                    levels[level][name] = None
+        self.levels: Dict[int, List[str]] = {level: list(names) for level, names in levels.items()}
+        self._sector_levels: Dict[str, Dict[int, List[str]]] = {}
+
+    def sector_levels(self, sector: str) -> Dict[int, List[str]]:
+        """Returns the processes per aggregation level starting with the given sector, cached per sector."""
+        if sector not in self._sector_levels:
+            self._sector_levels[sector] = {
+                level: [name for name in names if name.startswith(sector)] for level, names in self.levels.items()
+            }
+        return self._sector_levels[sector]
@@ -0,0 +1,514 @@
+"""Cache of graph layouts in memory and on disk, keyed by a fingerprint of the graph."""
+
+import contextlib
+import hashlib
+import logging
+import os
+import pathlib
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import igraph as ig
+import numpy as np
+
+from django_energysystem_viewer import settings
+from django_energysystem_viewer.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate layouts on disk whenever the way layouts are computed changes
+LAYOUT_VERSION = 1
+
+# Graph complexity per layout algorithm as function of node and edge count
+LAYOUT_COMPLEXITY = {
+    "kk": lambda nodes, edges: nodes**2,
+    # igraph uses a grid for Fruchterman-Reingold above 1000 nodes, which is linear but slower per node and edge
+    "fr": lambda nodes, edges: nodes**2 if nodes <= 1000 else 30 * (nodes + edges),
+    "go": lambda nodes, edges: nodes**2,
+    "fr_grid": lambda nodes, edges: nodes + edges,
+    "draft": lambda nodes, edges: nodes + edges,
+}
+# Initial estimates of seconds per unit of complexity, measured on SEDOS structures
+DEFAULT_LAYOUT_RATES = {"kk": 5e-6, "fr": 4e-6, "go": 1.3e-5, "fr_grid": 1.2e-4, "draft": 1.2e-5}
+# Cheaper algorithm to fall back to, if a layout would exceed its time budget
+FALLBACK_ALGORITHMS = {"kk": "fr", "go": "fr", "fr": "fr_grid"}
+# Graph sizes up to which "auto" selects Kamada-Kawai and exact Fruchterman-Reingold
+AUTO_KK_MAX_NODES = 300
+AUTO_FR_MAX_NODES = 1000
+
+# Layout coordinates keyed by graph fingerprint
+layout_cache = LRUCache(maxsize=settings.LAYOUT_CACHE_SIZE)
+
+# Process pool computing layouts of independent graphs in parallel, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+
+# Layouts computed in the background, keyed by graph fingerprint until they are stored in the cache
+_refinements: Dict[str, Future] = {}
+# Seconds after which a pending marker of a layout computed in the background is considered abandoned, e.g. because
+# the process computing it was stopped
+PENDING_MARKER_TIMEOUT = 600
+_refinements_lock = threading.Lock()
+
+
+class ThreadLocalRandom:
+    """
+    Random number generator for igraph, which draws from a separate generator per thread.
+
+    igraph keeps one random number generator per thread, which is replaced by this generator in every thread that
+    seeds it. Each thread then draws from its own seeded generator, so that concurrent layouts neither block nor draw
+    numbers from each other.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def generator(self):
+        # Threads outside of seeded_random draw from the global generator of the random module
+        return getattr(self._local, "generator", None) or random
+
+    def random(self) -> float:
+        return self.generator.random()
+
+    def randint(self, a: int, b: int) -> int:
+        return self.generator.randint(a, b)
+
+    def getrandbits(self, k: int) -> int:
+        return self.generator.getrandbits(k)
+
+    def gauss(self, mu: float, sigma: float) -> float:
+        return self.generator.gauss(mu, sigma)
+
+
+_thread_random = ThreadLocalRandom()
+ig.set_random_number_generator(_thread_random)
+
+
+@contextlib.contextmanager
+def seeded_random(seed: int):
+    """Lets igraph draw random numbers from a generator with the given seed within the context of this thread."""
+    if not getattr(_thread_random._local, "installed", False):
+        # Threads other than the importing one start with igraph's own generator, which ignores the seed
+        ig.set_random_number_generator(_thread_random)
+        _thread_random._local.installed = True
+    previous = getattr(_thread_random._local, "generator", None)
+    _thread_random._local.generator = random.Random(seed)
+    try:
+        yield
+    finally:
+        _thread_random._local.generator = previous
+
+
+def get_layout_key(
+    graph: ig.Graph,
+    algorithm: str,
+    seed: int,
+    initial: Optional[np.ndarray] = None,
+    fixed: Optional[np.ndarray] = None,
+) -> str:
+    """
+    Returns the fingerprint of a layout, which is a hash of the graph's node count and edge list, the algorithm and
+    the seed, as well as initial positions and fixed nodes of warm-started layouts.
+    """
+    edges = np.asarray(graph.get_edgelist(), dtype=np.int32)
+    fingerprint = hashlib.sha1()
+    fingerprint.update(f"{LAYOUT_VERSION}:{algorithm}:{seed}:{graph.vcount()}:".encode())
+    fingerprint.update(edges.tobytes())
+    if initial is not None:
+        fingerprint.update(b"initial:" + np.asarray(initial, dtype=np.float64).tobytes())
+    if fixed is not None:
+        fingerprint.update(b"fixed:" + np.asarray(fixed, dtype=bool).tobytes())
+    return fingerprint.hexdigest()
+
+
+def is_layout_key(key: str) -> bool:
+    """Checks whether a key sent by a client is a well-formed layout fingerprint."""
+    return isinstance(key, str) and re.fullmatch(r"[0-9a-f]{40}", key) is not None
+
+
+def peek_layout(key: str) -> Optional[np.ndarray]:
+    """Returns the coordinates of a layout from memory or disk, None if it has not been computed yet."""
+    coords = layout_cache.get(key)
+    if coords is None:
+        coords = read_layout(key)
+        if coords is not None:
+            layout_cache.set(key, coords)
+    return coords
+
+
+def get_layout_path(key: str, warm: bool = False) -> Optional[pathlib.Path]:
+    """Returns the path of a layout in the cache folder, warm-started layouts are kept in a separate folder."""
+    if settings.CACHE_DIR is None:
+        return None
+    folder = pathlib.Path(settings.CACHE_DIR) / "layouts"
+    return (folder / "warm" if warm else folder) / f"{key}.npy"
+
+
+def read_layout(key: str) -> Optional[np.ndarray]:
+    """Reads layout coordinates from disk, returns None if the layout has not been stored yet."""
+    for warm in (False, True):
+        path = get_layout_path(key, warm)
+        if path is None or not path.exists():
+            continue
+        try:
+            coords = np.load(path)
+        except (OSError, ValueError):
+            return None
+        if warm:
+            # Warm-started layouts are evicted by modification time, which marks them as recently used
+            with contextlib.suppress(OSError):
+                os.utime(path)
+        return coords
+    return None
+
+
+def write_layout(key: str, coords: np.ndarray, warm: bool = False):
+    """
+    Stores layout coordinates on disk, replacing the file atomically so that readers never see partial files.
+
+    Every sector selection warm-started from a previous one results in another layout, therefore only the
+    WARM_LAYOUT_FILES most recently used warm-started layouts are kept.
+    """
+    path = get_layout_path(key, warm)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{key}.", suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            np.save(file, coords)
+        os.replace(temp_path, path)
+        if warm:
+            evict_layouts(path.parent, settings.WARM_LAYOUT_FILES)
+    except OSError:
+        logger.warning(f"Could not store layout '{key}' in cache folder.", exc_info=True)
+
+
+def evict_layouts(folder: pathlib.Path, max_files: int):
+    """Removes the least recently used layouts of a folder exceeding the given number of files."""
+    files = []
+    for path in folder.glob("*.npy"):
+        with contextlib.suppress(OSError):
+            files.append((path.stat().st_mtime_ns, path))
+    files.sort()
+    for _, path in files[: max(len(files) - max_files, 0)]:
+        path.unlink(missing_ok=True)
+
+
+class LayoutTimings:
+    """
+    Records layout times per algorithm and estimates the time of future layouts from them.
+
+    The time of a layout is estimated as complexity of the graph for the algorithm (LAYOUT_COMPLEXITY) times the
+    seconds per unit of complexity, which starts at DEFAULT_LAYOUT_RATES and follows recorded layouts as moving
+    average.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rates: Dict[str, float] = dict(DEFAULT_LAYOUT_RATES)
+        self.counts: Dict[str, int] = {algorithm: 0 for algorithm in DEFAULT_LAYOUT_RATES}
+        self.seconds: Dict[str, float] = {algorithm: 0.0 for algorithm in DEFAULT_LAYOUT_RATES}
+
+    def record(self, algorithm: str, num_nodes: int, num_edges: int, seconds: float):
+        logger.info(f"Layout '{algorithm}' of {num_nodes} nodes and {num_edges} edges took {seconds:.3f}s.")
+        if algorithm not in LAYOUT_COMPLEXITY:
+            return
+        complexity = max(LAYOUT_COMPLEXITY[algorithm](num_nodes, num_edges), 1)
+        with self._lock:
+            self.rates[algorithm] = 0.8 * self.rates[algorithm] + 0.2 * seconds / complexity
+            self.counts[algorithm] += 1
+            self.seconds[algorithm] += seconds
+
+    def estimate(self, algorithm: str, num_nodes: int, num_edges: int) -> float:
+        if algorithm not in LAYOUT_COMPLEXITY:
+            return 0.0
+        return self.rates[algorithm] * LAYOUT_COMPLEXITY[algorithm](num_nodes, num_edges)
+
+    def info(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                algorithm: {"layouts": self.counts[algorithm], "seconds": self.seconds[algorithm], "rate": rate}
+                for algorithm, rate in self.rates.items()
+            }
+
+
+layout_timings = LayoutTimings()
+
+
+def select_algorithm(algorithm: str, num_nodes: int, num_edges: int, time_budget: Optional[float] = None) -> str:
+    """
+    Selects the layout algorithm for a graph.
+
+    Parameters
+    ----------
+    algorithm: str
+        Requested algorithm, "auto" selects Kamada-Kawai for small, Fruchterman-Reingold for medium and grid
+        accelerated Fruchterman-Reingold for large graphs.
+    num_nodes, num_edges: int
+        Size of the graph.
+    time_budget: float
+        Seconds the layout may take. If the estimated time exceeds it, cheaper algorithms are selected as given by
+        FALLBACK_ALGORITHMS. None disables the budget.
+
+    Returns
+    -------
+    str
+        The selected algorithm.
+    """
+    if algorithm == "auto":
+        if num_nodes <= AUTO_KK_MAX_NODES:
+            algorithm = "kk"
+        elif num_nodes <= AUTO_FR_MAX_NODES:
+            algorithm = "fr"
+        else:
+            algorithm = "fr_grid"
+    if time_budget is not None:
+        while algorithm in FALLBACK_ALGORITHMS:
+            if layout_timings.estimate(algorithm, num_nodes, num_edges) <= time_budget:
+                break
+            algorithm = FALLBACK_ALGORITHMS[algorithm]
+    return algorithm
+
+
+def _compute_coords(
+    num_nodes: int, edges: List[Tuple[int, int]], algorithm: str, seed: int, compute: Callable[..., ig.Layout]
+) -> Tuple[np.ndarray, float]:
+    # Runs in worker processes, which receive the graph as plain edge list
+    start = time.perf_counter()
+    layout = compute(ig.Graph(n=num_nodes, edges=edges), algorithm, seed)
+    return np.asarray(layout.coords, dtype=np.float64).reshape(-1, 2), time.perf_counter() - start
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Returns the process pool for layout computations shared by all requests of this process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.LAYOUT_PROCESSES)
+        return _executor
+
+
+def get_layouts(
+    graphs: List[ig.Graph],
+    algorithms: List[str],
+    compute: Callable[..., ig.Layout],
+    seed: int = settings.LAYOUT_SEED,
+) -> List[ig.Layout]:
+    """
+    Returns the layouts of multiple graphs, computing missing layouts in parallel in the layout process pool.
+
+    Parameters
+    ----------
+    graphs: list
+        Graphs to lay out.
+    algorithms: list
+        Name of the layout algorithm per graph.
+    compute: Callable
+        Computes the layout given graph, algorithm and seed. It must be a module-level function, so that it can be
+        sent to worker processes.
+    seed: int
+        Seed of the layout algorithm.
+
+    Returns
+    -------
+    list
+        The layouts in order of the graphs.
+    """
+    keys = [get_layout_key(graph, algorithm, seed) for graph, algorithm in zip(graphs, algorithms)]
+    coords = [peek_layout(key) for key in keys]
+    missing = [i for i, graph_coords in enumerate(coords) if graph_coords is None]
+    if len(missing) > 1 and settings.LAYOUT_PROCESSES > 1:
+        futures = {
+            i: get_executor().submit(
+                _compute_coords, graphs[i].vcount(), graphs[i].get_edgelist(), algorithms[i], seed, compute
+            )
+            for i in missing
+        }
+        results = {i: future.result() for i, future in futures.items()}
+    else:
+        results = {
+            i: _compute_coords(graphs[i].vcount(), graphs[i].get_edgelist(), algorithms[i], seed, compute)
+            for i in missing
+        }
+    for i, (graph_coords, seconds) in results.items():
+        layout_timings.record(algorithms[i], graphs[i].vcount(), graphs[i].ecount(), seconds)
+        write_layout(keys[i], graph_coords)
+        layout_cache.set(keys[i], graph_coords)
+        coords[i] = graph_coords
+    return [ig.Layout(graph_coords.tolist()) for graph_coords in coords]
+
+
+def get_layout(
+    graph: ig.Graph,
+    algorithm: str,
+    compute: Callable[..., ig.Layout],
+    seed: int = settings.LAYOUT_SEED,
+    initial: Optional[np.ndarray] = None,
+    fixed: Optional[np.ndarray] = None,
+    key: Optional[str] = None,
+) -> ig.Layout:
+    """
+    Returns the layout of a graph from memory, from disk or by computing it.
+
+    Parameters
+    ----------
+    graph: ig.Graph
+        Graph to lay out.
+    algorithm: str
+        Name of the layout algorithm.
+    compute: Callable
+        Computes the layout given graph, algorithm and seed, as well as initial positions and fixed nodes for
+        warm-started layouts. It must be deterministic for given arguments.
+    seed: int
+        Seed of the layout algorithm.
+    initial: np.ndarray
+        Initial positions of all nodes to warm-start the layout from.
+    fixed: np.ndarray
+        Boolean mask of nodes which keep their initial position.
+    key: str
+        Fingerprint of the layout, if already known, see get_layout_key.
+
+    Returns
+    -------
+    ig.Layout
+        The layout of the graph.
+    """
+    if key is None:
+        key = get_layout_key(graph, algorithm, seed, initial, fixed)
+
+    def load() -> np.ndarray:
+        coords = read_layout(key)
+        if coords is None:
+            if initial is None:
+                coords, seconds = _compute_coords(graph.vcount(), graph.get_edgelist(), algorithm, seed, compute)
+                layout_timings.record(algorithm, graph.vcount(), graph.ecount(), seconds)
+            else:
+                # Warm-started layouts run fewer iterations and are not recorded, as they would distort estimates
+                layout = compute(graph, algorithm, seed, initial=initial, fixed=fixed)
+                coords = np.asarray(layout.coords, dtype=np.float64).reshape(-1, 2)
+            write_layout(key, coords, warm=initial is not None)
+        return coords
+
+    return ig.Layout(layout_cache.get_or_set(key, load).tolist())
+
+
+def refine_layout(
+    graph: ig.Graph,
+    algorithm: str,
+    compute: Callable[..., ig.Layout],
+    seed: int = settings.LAYOUT_SEED,
+    key: Optional[str] = None,
+) -> str:
+    """
+    Starts computing the layout of a graph in the layout process pool and returns without waiting for it.
+
+    The layout is stored in the cache once it is computed, see get_layout_status. A layout which is already computed
+    in the background is not started again.
+
+    Parameters
+    ----------
+    graph: ig.Graph
+        Graph to lay out.
+    algorithm: str
+        Name of the layout algorithm.
+    compute: Callable
+        Computes the layout given graph, algorithm and seed, see get_layouts.
+    seed: int
+        Seed of the layout algorithm.
+    key: str
+        Fingerprint of the layout, if already known, see get_layout_key.
+
+    Returns
+    -------
+    str
+        The fingerprint of the layout.
+    """
+    if key is None:
+        key = get_layout_key(graph, algorithm, seed)
+    num_nodes, num_edges = graph.vcount(), graph.ecount()
+    with _refinements_lock:
+        # Layouts computed by other processes are announced by their pending marker in the cache folder
+        if key in _refinements or not claim_pending_marker(key):
+            return key
+        future = get_executor().submit(_compute_coords, num_nodes, graph.get_edgelist(), algorithm, seed, compute)
+        _refinements[key] = future
+
+    def store(done: Future):
+        try:
+            coords, seconds = done.result()
+            layout_timings.record(algorithm, num_nodes, num_edges, seconds)
+            write_layout(key, coords)
+            layout_cache.set(key, coords)
+        except Exception:
+            logger.exception(f"Could not compute layout '{key}' in the background.")
+        finally:
+            with _refinements_lock:
+                _refinements.pop(key, None)
+                remove_pending_marker(key)
+
+    future.add_done_callback(store)
+    return key
+
+
+def get_pending_marker_path(key: str) -> Optional[pathlib.Path]:
+    """Returns the path of the marker announcing that a layout is computed in the background."""
+    path = get_layout_path(key)
+    return None if path is None else path.with_suffix(".pending")
+
+
+def is_pending_marker_fresh(path: pathlib.Path) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime < PENDING_MARKER_TIMEOUT
+    except OSError:
+        return False
+
+
+def claim_pending_marker(key: str) -> bool:
+    """
+    Creates the pending marker of a layout, unless another process already computes the layout.
+
+    Returns False if a fresh marker exists, True otherwise, including if there is no cache folder or the marker can
+    not be written, as the layout is computed by this process then.
+    """
+    path = get_pending_marker_path(key)
+    if path is None:
+        return True
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and not is_pending_marker_fresh(path):
+            path.unlink(missing_ok=True)
+        # Exclusive creation lets only one process claim the layout
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    except OSError:
+        logger.warning(f"Could not store pending marker of layout '{key}' in cache folder.", exc_info=True)
+    return True
+
+
+def remove_pending_marker(key: str):
+    path = get_pending_marker_path(key)
+    if path is not None:
+        with contextlib.suppress(OSError):
+            path.unlink(missing_ok=True)
+
+
+def get_layout_status(key: str) -> Optional[str]:
+    """
+    Returns "ready" if the layout with the given fingerprint is cached, "pending" while it is computed in the
+    background by this or another process sharing the cache folder and None otherwise.
+    """
+    with _refinements_lock:
+        if key in _refinements:
+            return "pending"
+    if peek_layout(key) is not None:
+        return "ready"
+    path = get_pending_marker_path(key)
+    return "pending" if path is not None and is_pending_marker_fresh(path) else None
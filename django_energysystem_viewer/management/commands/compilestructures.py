@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_energysystem_viewer import structures
+
+
+class Command(BaseCommand):
+    help = "Compiles structure workbooks into columnar sidecar files which are loaded instead of the workbooks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "structure_names", nargs="*", type=str, help="Structures to compile, defaults to all structures"
+        )
+
+    def handle(self, *args, **options):
+        if structures.pa is None:
+            raise CommandError("Compiling structures requires pyarrow, install it via 'pip install pyarrow'.")
+        if options["structure_names"]:
+            paths = [structures.get_structure_path(name) for name in options["structure_names"]]
+        else:
+            paths = structures.get_structure_paths()
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f'Structure "{path.stem}" not found in folder "{path.parent}".')
+            sidecar = structures.write_sidecar(path)
+            self.stdout.write(self.style.SUCCESS(f'Successfully compiled structure "{path.stem}" into "{sidecar}".'))
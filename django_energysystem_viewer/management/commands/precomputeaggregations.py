@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_energysystem_viewer import aggregation_graph as ag
+from django_energysystem_viewer import settings, structures, views
+
+
+class Command(BaseCommand):
+    help = (
+        "Precomputes the aggregation graphs of all sectors and stores them serialised in the cache folder, "
+        "so that the aggregation page serves them without building them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "structure_names", nargs="*", type=str, help="Structures to precompute, defaults to all structures"
+        )
+
+    def handle(self, *args, **options):
+        if settings.CACHE_DIR is None:
+            raise CommandError("Precomputing aggregation graphs requires setting ENERGYSYSTEM_VIEWER_CACHE_DIR.")
+        if options["structure_names"]:
+            paths = [structures.get_structure_path(name) for name in options["structure_names"]]
+        else:
+            paths = structures.get_structure_paths()
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f'Structure "{path.stem}" not found in folder "{path.parent}".')
+
+        for path in paths:
+            start = time.perf_counter()
+            for sector in ag.AGGREGATION_SECTORS:
+                views.get_aggregation_json(path.stem, sector)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully precomputed {len(ag.AGGREGATION_SECTORS)} aggregation graphs of structure "
+                    f'"{path.stem}" in {time.perf_counter() - start:.1f}s.'
+                )
+            )
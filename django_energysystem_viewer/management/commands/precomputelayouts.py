@@ -0,0 +1,88 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_energysystem_viewer import network_graph as ng
+from django_energysystem_viewer import settings, structures, views
+from django_energysystem_viewer.structure_model import SECTORS
+
+# Sector layouts offered on the network page, joined and separated by sector
+SECTOR_LAYOUTS = ["agg", "sep"]
+
+
+def init_worker():
+    # Separated layouts are computed one after another, as the command's pool already uses all processes
+    settings.LAYOUT_PROCESSES = 1
+
+
+def precompute_layout(
+    structure_name: str, nomenclature_level: int, sectors: tuple, algorithm: str, sector_layout: str
+) -> float:
+    """Computes and stores the layout of one network view, returns the time it took in seconds."""
+    start = time.perf_counter()
+    structure_model = views.get_structure_model(structure_name, nomenclature_level)
+    if sector_layout == "sep":
+        ng.generate_separated_layout(structure_model, list(sectors), algorithm)
+    else:
+        ng.generate_sector_layout(structure_model, list(sectors), algorithm)
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Precomputes network layouts for every combination of sectors, algorithm, nomenclature level and sector "
+        "layout, so that the network page reads layouts from the layout cache instead of computing them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "structure_names", nargs="*", type=str, help="Structures to precompute, defaults to all structures"
+        )
+        parser.add_argument(
+            "--processes", type=int, default=os.cpu_count(), help="Number of worker processes, defaults to CPU count"
+        )
+
+    def handle(self, *args, **options):
+        if settings.CACHE_DIR is None:
+            raise CommandError("Precomputing layouts requires setting ENERGYSYSTEM_VIEWER_CACHE_DIR.")
+        if options["structure_names"]:
+            paths = [structures.get_structure_path(name) for name in options["structure_names"]]
+        else:
+            paths = structures.get_structure_paths()
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f'Structure "{path.stem}" not found in folder "{path.parent}".')
+
+        sector_combinations = [
+            combination for size in range(1, len(SECTORS) + 1) for combination in itertools.combinations(SECTORS, size)
+        ]
+        for path in paths:
+            # Build the models before forking, so that worker processes inherit them instead of parsing the workbook
+            for nomenclature_level in ng.NOMENCLATURE_LEVELS:
+                views.get_structure_model(path.stem, nomenclature_level)
+            # "auto" runs after the other algorithms, so that it reads the layouts of the algorithms it resolves to
+            # from the cache and only computes grid accelerated Fruchterman-Reingold layouts of large graphs
+            task_groups = [
+                list(itertools.product(ng.NOMENCLATURE_LEVELS, sector_combinations, algorithms, SECTOR_LAYOUTS))
+                for algorithms in (ng.ALGORITHMS, ["auto"])
+            ]
+            tasks = [task for group in task_groups for task in group]
+            start = time.perf_counter()
+            done = 0
+            with ProcessPoolExecutor(max_workers=options["processes"], initializer=init_worker) as executor:
+                for group in task_groups:
+                    futures = [executor.submit(precompute_layout, path.stem, *task) for task in group]
+                    for future in as_completed(futures):
+                        future.result()
+                        done += 1
+                        if options["verbosity"] > 1:
+                            self.stdout.write(f'{done}/{len(tasks)} layouts of structure "{path.stem}" computed')
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Successfully precomputed {len(tasks)} layouts of structure "{path.stem}" '
+                    f"in {time.perf_counter() - start:.1f}s."
+                )
+            )
@@ -1,18 +1,49 @@
+import bisect
+from typing import List, Set, Tuple, Union
+
 import igraph as ig
-import pandas as pd
 import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-from django.conf import settings
-from typing import List, Tuple, Union
+
+from django_energysystem_viewer import layouts
+from django_energysystem_viewer import settings as app_settings
+from django_energysystem_viewer.nomenclature import NomenclatureTree
+from django_energysystem_viewer.reachability import ReachabilityIndex
+from django_energysystem_viewer.structure_model import SECTORS, StructureModel
+
+# Options offered on the network page
+ALGORITHMS = ["fr", "kk", "go"]
+NOMENCLATURE_LEVELS = [20, 3, 2]
+# igraph neighbourhood modes per direction of ego networks
+EGO_DIRECTIONS = {"upstream": ["in"], "downstream": ["out"], "both": ["in", "out"]}
+MAX_EGO_RADIUS = 20
+# Iterations of warm-started layouts, igraph defaults to 500 iterations for "fr" and "go" and 50 * nodes for "kk"
+WARM_START_ITERATIONS = 100
+# Iterations of draft layouts shown while the layout is computed in the background
+DRAFT_ITERATIONS = 50
+# Line width of edges by the minimum number of parallel edges collapsed into them
+EDGE_WIDTHS = [(1, 0.5), (2, 1.0), (3, 1.5), (5, 2.0)]
+
 
 def generate_Graph(
-        updated_process_set: pd.DataFrame,
-        selected_sectors: List[str],
-        algorithm: str,
-        separate_commodities: str,
-        process_specific: str,
-        commodity_specific: str,
-        nomenclature_level: int,
+    updated_process_set: pd.DataFrame,
+    selected_sectors: List[str],
+    algorithm: str,
+    separate_commodities: str,
+    process_specific: str,
+    commodity_specific: str,
+    nomenclature_level: int,
+    structure_model: StructureModel = None,
+    render: str = "auto",
+    structure_index: StructureModel = None,
+    highlight: str = None,
+    highlight_direction: str = "both",
+    reachability: ReachabilityIndex = None,
+    previous_sectors: List[str] = None,
+    previous_layout: str = None,
+    time_budget: float = None,
+    progressive: bool = False,
 ) -> go.Figure:
     """
     Generate a Plotly graph for the selected sectors and algorithm.
@@ -20,10 +51,21 @@ def generate_Graph(
     Parameters:
     updated_process_set (pd.DataFrame): The updated process set from the Excel file.
     selected_sectors (List[str]): The selected sectors for filtering the process set.
-    algorithm (str): The selected algorithm for generating the layout.
+    algorithm (str): The selected algorithm for generating the layout, "auto" selects it by graph size.
     separate_commodities (str): Option to separate or aggregate commodities.
     process_specific (str): The selected process to generate the graph for.
     commodity_specific (str): The selected commodity to generate the graph for.
+    nomenclature_level (int): Number of nomenclature parts by which processes are grouped.
+    structure_model (StructureModel, optional): Prebuilt overview model, see build_overview_model.
+    render (str, optional): "svg", "webgl" or "auto", which uses WebGL for graphs above WEBGL_THRESHOLD elements.
+    structure_index (StructureModel, optional): Prebuilt model of the ungrouped process set, see build_structure_index.
+    highlight (str, optional): Process or commodity whose upstream and/or downstream cone is highlighted.
+    highlight_direction (str, optional): "upstream", "downstream" or "both".
+    reachability (ReachabilityIndex, optional): Prebuilt reachability index of the overview model.
+    previous_sectors (List[str], optional): Sectors of the previously shown graph to warm-start the layout from.
+    previous_layout (str, optional): Key of the previously shown layout, returned in the figure's layout meta.
+    time_budget (float, optional): Seconds the layout may take, cheaper algorithms are used if it would take longer.
+    progressive (bool, optional): Returns a draft layout for slow layouts, see generate_sector_layout.
 
     Returns:
     go.Figure: The generated graph.
@@ -56,18 +98,51 @@ def generate_Graph(
 
     fig = go.Figure(layout=graph_layout)
 
+    if structure_model is None and not process_specific and not commodity_specific:
+        structure_model = build_overview_model(updated_process_set, nomenclature_level)
+
     if not process_specific and not commodity_specific:
         if separate_commodities == "sep":
-            traces = generate_trace(updated_process_set, selected_sectors, algorithm, "sep", nomenclature_level)
+            traces = generate_trace(
+                updated_process_set,
+                selected_sectors,
+                algorithm,
+                "sep",
+                nomenclature_level,
+                structure_model,
+                render,
+                get_cone(structure_model, highlight, highlight_direction, nomenclature_level, reachability),
+                previous_sectors,
+                previous_layout,
+                time_budget,
+                progressive,
+            )
             fig.add_traces(traces)
+            fig.update_layout(meta=traces[0].meta)
         elif separate_commodities == "agg":
-            traces = generate_trace(updated_process_set, selected_sectors, algorithm, "agg", nomenclature_level)
+            traces = generate_trace(
+                updated_process_set,
+                selected_sectors,
+                algorithm,
+                "agg",
+                nomenclature_level,
+                structure_model,
+                render,
+                get_cone(structure_model, highlight, highlight_direction, nomenclature_level, reachability),
+                previous_sectors,
+                previous_layout,
+                time_budget,
+                progressive,
+            )
             fig.add_traces(traces)
+            fig.update_layout(meta=traces[0].meta)
     elif process_specific:
-        traces = generate_trace_process_specific(updated_process_set, process_specific)
+        traces = generate_trace_process_specific(updated_process_set, process_specific, structure_index)
         fig.add_traces(traces)
     elif commodity_specific:
-        traces = generate_trace_commodity_specific(updated_process_set, commodity_specific, selected_sectors)
+        traces = generate_trace_commodity_specific(
+            updated_process_set, commodity_specific, selected_sectors, structure_index
+        )
         fig.add_traces(traces)
 
     fig.update_xaxes(visible=False)
@@ -79,8 +154,21 @@ def generate_Graph(
 
     return fig
 
-def generate_trace(process_set: pd.DataFrame, selected_sectors: list, algorithm: str, separate_commodities: str, nomenclature_level : int) -> List[
-    go.Scatter]:
+
+def generate_trace(
+    process_set: pd.DataFrame,
+    selected_sectors: list,
+    algorithm: str,
+    separate_commodities: str,
+    nomenclature_level: int,
+    structure_model: StructureModel = None,
+    render: str = "auto",
+    cone: Set[str] = None,
+    previous_sectors: List[str] = None,
+    previous_layout: str = None,
+    time_budget: float = None,
+    progressive: bool = False,
+) -> List[go.Scatter]:
     """
     Generate Plotly traces for nodes and edges.
 
@@ -89,126 +177,365 @@ def generate_trace(process_set: pd.DataFrame, selected_sectors: list, algorithm:
     sector (str): The selected sector for filtering the process set.
     algorithm (str): The selected algorithm for generating the layout.
     separate_commodities (str): Option to separate or aggregate commodities.
+    nomenclature_level (int): Number of nomenclature parts by which processes are grouped.
+    structure_model (StructureModel, optional): Prebuilt model of the process set at the nomenclature level.
+    render (str, optional): "svg", "webgl" or "auto", see use_webgl.
+    cone (Set[str], optional): Names of highlighted nodes, other nodes are faded, see get_cone.
+    previous_sectors (List[str], optional): Sectors of the previously shown graph to warm-start the layout from.
+    previous_layout (str, optional): Key of the previously shown layout.
+    time_budget (float, optional): Seconds the layout may take, see generate_sector_layout.
+    progressive (bool, optional): Returns a draft layout for slow layouts, see generate_sector_layout.
 
     Returns:
-    List[go.Scatter]: Combined trace of nodes and edges including their colors and shapes.
+    List[go.Scatter]: Combined trace of nodes and edges including their colors and shapes. The layout meta returned
+    by generate_sector_layout is stored as meta of the first (edge) trace.
     """
-    # process_set = process_set[~process_set["process"].str.endswith(("_ag_0","_ag_1"))]
+    if structure_model is None:
+        structure_model = build_overview_model(process_set, nomenclature_level)
+    cross_sector_edges = set()
+    if separate_commodities == "sep":
+        # Separated sector layouts are not warm-started
+        model, layout, cross_sector_edges = generate_separated_layout(
+            structure_model, selected_sectors, algorithm, time_budget
+        )
+        layout_meta = {"layout_key": None, "layout_algorithm": None, "refining": None}
+    else:
+        model, layout, layout_meta = generate_sector_layout(
+            structure_model, selected_sectors, algorithm, previous_sectors, previous_layout, time_budget, progressive
+        )
+    nodes, edges, processes = model.names, model.edges, model.processes
+    edge_weights = dict(zip(edges, model.weights.tolist()))
 
-    # Group all processes according to their nomenclature with informations levels divided by underscores
-    # process_set.replace({np.nan: None}, inplace=True)
-    process_set['process_trimmed'] = process_set['process'].apply(lambda x: '_'.join(x.split('_')[:nomenclature_level]))
-    process_set_grouped = process_set.groupby('process_trimmed').agg({
-        'input': lambda x: ','.join(map(str, filter(pd.notna, x))),
-        'output': lambda x: ','.join(map(str, filter(pd.notna, x)))
-    }).reset_index()
-    process_set_grouped.rename(columns={'process_trimmed': 'process'}, inplace=True)
-    # Remove duplicate inputs/outputs after the grouping
-    process_set_grouped['input'] = process_set_grouped['input'].apply(lambda x: ','.join(sorted(set(x.split(',')))) if pd.notna(x) else x)
-    process_set_grouped['output'] = process_set_grouped['output'].apply(lambda x: ','.join(sorted(set(x.split(',')))) if pd.notna(x) else x)
+    labels, node_colors, node_shapes = get_node_attributes(nodes, processes)
+    x_offset, y_offset = 0, 0
+    Xn, Yn = get_node_coordinates(layout, len(nodes), x_offset, y_offset)
+    opacities = None
+    cone_edges = []
+    if cone is not None:
+        opacities = [1.0 if node in cone else 0.15 for node in nodes]
+        cone_edges = [e for e in edges if nodes[e[0]] in cone and nodes[e[1]] in cone]
+        edges = [e for e in edges if not (nodes[e[0]] in cone and nodes[e[1]] in cone)]
+    cross_edges = [e for e in edges if e in cross_sector_edges]
+    edges = [e for e in edges if e not in cross_sector_edges]
+
+    if use_webgl(len(nodes), len(edges) + len(cone_edges) + len(cross_edges), render):
+        get_coordinates, create_trace, trace_type = get_arrow_coordinates, create_edge_trace_gl, go.Scattergl
+    else:
+        get_coordinates, create_trace, trace_type = get_edge_coordinates, create_edge_trace, go.Scatter
+    edge_traces = []
+    for width, width_edges in group_edges_by_width(edges, edge_weights):
+        edge_trace = create_trace(*get_coordinates(layout, width_edges, x_offset, y_offset))
+        edge_trace.update(line=dict(width=width), legendgroup="edges")
+        edge_traces.append(edge_trace)
+    edge_traces[0].meta = layout_meta
+    if cross_edges:
+        cross_trace = create_trace(*get_coordinates(layout, cross_edges, x_offset, y_offset))
+        cross_trace.update(name="cross-sector edges", line=dict(color="rgb(200,200,200)", width=0.5, dash="dash"))
+        edge_traces.append(cross_trace)
+    if cone_edges:
+        cone_trace = create_trace(*get_coordinates(layout, cone_edges, x_offset, y_offset))
+        cone_trace.update(name="cone", line=dict(color="rgb(214,39,40)", width=1.5))
+        edge_traces.append(cone_trace)
+    node_traces = create_node_traces_by_color(
+        Xn, Yn, labels, node_shapes, node_colors, processes, trace_type=trace_type, opacities=opacities
+    )
 
-    inputs, outputs, processes = get_filtered_process_data(process_set_grouped, selected_sectors)
+    return edge_traces + node_traces
 
-    nodes, edges = create_nodes_and_edges(inputs, outputs, processes)
-    G = ig.Graph(edges)
-    layout = generate_layout(G, algorithm)
 
-    labels, node_colors, node_shapes = get_node_attributes(nodes, processes)
-    for sector in selected_sectors:
-        x_offset, y_offset = calculate_offset(sector, algorithm) if separate_commodities == "sep" else (0, 0)
-    Xn, Yn = get_node_coordinates(layout, len(nodes), x_offset, y_offset)
-    Xe, Ye = get_edge_coordinates(layout, edges, x_offset, y_offset)
+def get_cone(
+    structure_model: StructureModel,
+    highlight: str,
+    direction: str,
+    nomenclature_level: int,
+    reachability: ReachabilityIndex = None,
+) -> Union[Set[str], None]:
+    """
+    Get the names of all nodes upstream and/or downstream of the highlighted node.
 
-    edge_trace = create_edge_trace(Xe, Ye)
-    node_traces = create_node_traces_by_color(Xn, Yn, labels, node_shapes, node_colors, processes)
+    Parameters:
+    structure_model (StructureModel): Overview model of all sectors, see build_overview_model.
+    highlight (str): Name of the highlighted process or commodity, None disables highlighting.
+    direction (str): "upstream", "downstream" or "both".
+    nomenclature_level (int): Number of nomenclature parts by which processes are grouped.
+    reachability (ReachabilityIndex, optional): Prebuilt reachability index of the overview model.
 
-    return [edge_trace] + node_traces
+    Returns:
+    Union[Set[str], None]: Names of nodes within the cone, None if nothing is highlighted or the node is unknown.
+    """
+    if not highlight:
+        return None
+    # Full process and commodity names are mapped to their grouped and merged node in the overview
+    candidates = [highlight, highlight.replace("_orig", ""), "_".join(highlight.split("_")[:nomenclature_level])]
+    node = next((candidate for candidate in candidates if candidate in structure_model.ids), None)
+    if node is None:
+        return None
+    if reachability is None:
+        reachability = ReachabilityIndex(structure_model)
+    return {structure_model.names[i] for i in np.flatnonzero(reachability.cone(node, direction))}
+
+
+def group_by_nomenclature(
+    process_set: pd.DataFrame, nomenclature_level: int, nomenclature_tree: NomenclatureTree = None
+) -> pd.DataFrame:
+    """
+    Group all processes according to their nomenclature with information levels divided by underscores.
+
+    Parameters:
+    process_set (pd.DataFrame): The updated process set from the Excel file.
+    nomenclature_level (int): Number of nomenclature parts to keep, None keeps full process names.
+    nomenclature_tree (NomenclatureTree, optional): Prebuilt tree of the process set holding all levels.
 
-def get_filtered_process_data(process_set: pd.DataFrame, selected_sectors: list) -> Tuple[
-    List[str], List[str], List[str]]:
+    Returns:
+    pd.DataFrame: Process set with one row per grouped process and the combined inputs and outputs.
     """
-    Get filtered process data based on the provided filter type and value.
+    if nomenclature_tree is None:
+        nomenclature_tree = NomenclatureTree(process_set)
+    return nomenclature_tree.process_set(nomenclature_level)
+
+
+def build_structure_index(process_set: pd.DataFrame) -> StructureModel:
+    """
+    Build the model of the ungrouped process set, which maps commodities to producing and consuming processes and
+    processes to their inputs and outputs by exact name.
 
     Parameters:
-    process_set (pd.DataFrame): The process set DataFrame.
-    filter_value (str): The value to filter by.
-    filter_type (str): The type of filter ('sector', 'process').
+    process_set (pd.DataFrame): The updated process set from the Excel file.
 
     Returns:
-    Tuple[List[str], List[str], List[str]]: Lists of inputs, outputs, and processes.
+    StructureModel: Model of all processes and commodities.
     """
-    sector_abbrvs = ["pow", "x2x", "ind", "tra", "hea", "hel"]
-    filtered_set = pd.DataFrame()
-    for sector_abbrv in sector_abbrvs:
-        if sector_abbrv in selected_sectors:
-            filtered_set = pd.concat(
-                [filtered_set, process_set[process_set["process"].str.startswith(sector_abbrv)]])
-    inputs = filtered_set["input"].tolist()
-    outputs = filtered_set["output"].tolist()
-    processes = filtered_set["process"].tolist()
+    return StructureModel.from_process_set(process_set)
 
-    return inputs, outputs, processes
 
+def build_overview_model(
+    process_set: pd.DataFrame, nomenclature_level: int, nomenclature_tree: NomenclatureTree = None
+) -> StructureModel:
+    """
+    Build the structure model shown in the network overview.
+
+    Processes are grouped by nomenclature level, emissions are left out and "_orig" commodities are merged.
 
-def create_nodes_and_edges(inputs: List[str], outputs: List[str], processes: List[str]) -> Tuple[
-    List[str], List[Tuple[int, int]]]:
+    Parameters:
+    process_set (pd.DataFrame): The updated process set from the Excel file.
+    nomenclature_level (int): Number of nomenclature parts by which processes are grouped.
+    nomenclature_tree (NomenclatureTree, optional): Prebuilt tree of the process set holding all levels.
+
+    Returns:
+    StructureModel: Model of all sectors, reduced to the selected sectors per request.
+    """
+    process_set_grouped = group_by_nomenclature(process_set, nomenclature_level, nomenclature_tree)
+    return StructureModel.from_process_set(process_set_grouped, merge_orig=True, exclude_prefixes=("emi",))
+
+
+def generate_sector_layout(
+    structure_model: StructureModel,
+    selected_sectors: List[str],
+    algorithm: str,
+    previous_sectors: List[str] = None,
+    previous_layout: str = None,
+    time_budget: float = None,
+    progressive: bool = False,
+) -> Tuple[StructureModel, ig.Layout, dict]:
     """
-    Create nodes and edges from inputs, outputs, and processes.
+    Reduce the structure model to the selected sectors and generate its layout.
+
+    Cached layouts are served as they are. Otherwise, if the layout of a previous sector selection is given, the
+    layout is warm-started from it: nodes shown before keep their position and only new nodes are placed. Drafts are
+    never warm-started from.
+
+    In progressive mode, layouts which are not cached and estimated to take longer than PROGRESSIVE_LAYOUT_SECONDS
+    are computed in the background, while a draft layout with few iterations is returned right away. This applies to
+    layouts which could be warm-started as well.
 
     Parameters:
-    inputs (List[str]): List of input nodes.
-    outputs (List[str]): List of output nodes.
-    processes (List[str]): List of process nodes.
+    structure_model (StructureModel): Overview model of all sectors, see build_overview_model.
+    selected_sectors (List[str]): The selected sectors.
+    algorithm (str): The selected algorithm for generating the layout.
+    previous_sectors (List[str], optional): Sectors of the previously shown graph of the same structure model.
+    previous_layout (str, optional): Key of the previously shown layout.
+    time_budget (float, optional): Seconds the layout may take, cheaper algorithms are used if it would take longer.
+    progressive (bool, optional): Returns a draft layout for slow layouts.
 
     Returns:
-    Tuple[List[str], List[Tuple[int, int]]]: Nodes and edges.
-    """
-    nodes, edges = [], []
-    for i in range(len(processes)):
-        input_list = inputs[i].split(",") if isinstance(inputs[i], str) else []
-        input_list = [item.strip().replace("[", "").replace("]", "") for item in input_list]
-        input_list = [item.strip().replace("_orig", "") for item in input_list]
-        input_list = [commodity for commodity in input_list if isinstance(commodity, str) and not commodity.startswith('emi')]
-
-        output_list = outputs[i].split(",") if isinstance(outputs[i], str) else []
-        output_list = [item.strip().replace("[", "").replace("]", "") for item in output_list]
-        output_list = [item.strip().replace("_orig", "") for item in output_list]
-        output_list = [commodity for commodity in output_list if isinstance(commodity, str) and not commodity.startswith('emi')]
-
-        process_list = processes[i].split(",") if isinstance(processes[i], str) else []
-        process_list = [item.strip().replace("[", "").replace("]", "") for item in process_list]
-
-        input_list = [input_node for input_node in input_list if input_node != '']
-        output_list = [ouput_node for ouput_node in output_list if ouput_node != '']
-
-        for input_node in input_list:
-            if input_node not in nodes:
-                nodes.append(input_node)
-            source_index = nodes.index(input_node)
-
-            for process_node in process_list:
-                if process_node not in nodes:
-                    nodes.append(process_node)
-                target_index = nodes.index(process_node)
-                edges.append((source_index, target_index))
-
-        for process_node in process_list:
-            if process_node not in nodes:
-                nodes.append(process_node)
-            source_index = nodes.index(process_node)
-
-            for output_node in output_list:
-                if output_node not in nodes:
-                    nodes.append(output_node)
-                target_index = nodes.index(output_node)
-                edges.append((source_index, target_index))
-
-    return nodes, edges
+    Tuple[StructureModel, ig.Layout, dict]: The model of the selected sectors, its layout and the layout meta holding
+    the layout key, the algorithm used and the key of the layout computed in the background, if it is a draft.
+    """
+    model = structure_model.subgraph(selected_sectors)
+    G = ig.Graph(n=len(model), edges=model.edges)
+    seed = app_settings.LAYOUT_SEED
+    algorithm = layouts.select_algorithm(algorithm, G.vcount(), G.ecount())
+    key = layouts.get_layout_key(G, algorithm, seed)
+    # Cached layouts are served regardless of the time budget and the previous layout
+    if layouts.peek_layout(key) is None and time_budget is not None:
+        fallback = layouts.select_algorithm(algorithm, G.vcount(), G.ecount(), time_budget)
+        if fallback != algorithm:
+            algorithm = fallback
+            key = layouts.get_layout_key(G, algorithm, seed)
+    status = layouts.get_layout_status(key)
+    threshold = app_settings.PROGRESSIVE_LAYOUT_SECONDS
+    if (
+        progressive
+        and threshold is not None
+        and status != "ready"
+        and layouts.layout_timings.estimate(algorithm, G.vcount(), G.ecount()) > threshold
+    ):
+        refining = layouts.refine_layout(G, algorithm, compute_layout, seed, key)
+        key = layouts.get_layout_key(G, "draft", seed)
+        layout = layouts.get_layout(G, "draft", compute_layout, seed, key=key)
+        return model, layout, {"layout_key": key, "layout_algorithm": "draft", "refining": refining}
+    initial, fixed = None, None
+    if status != "ready":
+        initial, fixed = get_warm_start(model, structure_model, previous_sectors, previous_layout, seed)
+        if initial is not None:
+            key = layouts.get_layout_key(G, algorithm, seed, initial, fixed)
+    layout = layouts.get_layout(G, algorithm, compute_layout, seed, initial, fixed, key)
+    return model, layout, {"layout_key": key, "layout_algorithm": algorithm, "refining": None}
+
+
+def generate_separated_layout(
+    structure_model: StructureModel, selected_sectors: List[str], algorithm: str, time_budget: float = None
+) -> Tuple[StructureModel, ig.Layout, Set[Tuple[int, int]]]:
+    """
+    Lay out every selected sector on its own and pack the sector layouts next to each other.
+
+    Each commodity is assigned to the sector with most edges to it. Sector layouts are computed in parallel in the
+    layout process pool and packed into shelves, edges between sectors connect the packed sector layouts.
+
+    Parameters:
+    structure_model (StructureModel): Overview model of all sectors, see build_overview_model.
+    selected_sectors (List[str]): The selected sectors.
+    algorithm (str): The selected algorithm for generating the layouts.
+    time_budget (float, optional): Seconds each sector layout may take, see generate_sector_layout.
+
+    Returns:
+    Tuple[StructureModel, ig.Layout, Set[Tuple[int, int]]]: The model of the selected sectors, the packed layout and
+    the edges between sectors.
+    """
+    model = structure_model.subgraph(selected_sectors)
+    sources, targets = model.sources, model.targets
+    # Every edge connects a process with a commodity
+    process_ends = np.where(model.is_process[sources], sources, targets)
+    commodity_ends = np.where(model.is_process[sources], targets, sources)
+    edge_counts = np.zeros((len(model), len(SECTORS)), dtype=np.int32)
+    np.add.at(edge_counts, (commodity_ends, model.sectors[process_ends]), 1)
+    home_sectors = np.where(model.is_process, model.sectors, edge_counts.argmax(axis=1))
+
+    sector_node_ids, graphs = [], []
+    for sector in dict.fromkeys(home_sectors.tolist()):
+        node_ids = np.flatnonzero(home_sectors == sector)
+        local_ids = np.full(len(model), -1, dtype=np.int32)
+        local_ids[node_ids] = np.arange(len(node_ids), dtype=np.int32)
+        edge_mask = (home_sectors[sources] == sector) & (home_sectors[targets] == sector)
+        local_edges = list(zip(local_ids[sources[edge_mask]].tolist(), local_ids[targets[edge_mask]].tolist()))
+        sector_node_ids.append(node_ids)
+        graphs.append(ig.Graph(n=len(node_ids), edges=local_edges))
+    algorithms = [layouts.select_algorithm(algorithm, G.vcount(), G.ecount(), time_budget) for G in graphs]
+    sector_layouts = layouts.get_layouts(graphs, algorithms, compute_layout)
+
+    coords = np.zeros((len(model), 2))
+    packed = pack_shelves([np.asarray(layout.coords, dtype=float).reshape(-1, 2) for layout in sector_layouts])
+    for node_ids, sector_coords in zip(sector_node_ids, packed):
+        coords[node_ids] = sector_coords
+    cross_mask = home_sectors[sources] != home_sectors[targets]
+    cross_sector_edges = set(zip(sources[cross_mask].tolist(), targets[cross_mask].tolist()))
+    return model, ig.Layout(coords.tolist()), cross_sector_edges
+
+
+def pack_shelves(components: List[np.ndarray], padding: float = 0.1) -> List[np.ndarray]:
+    """
+    Pack component layouts into rows (shelves) without overlap, highest components first.
+
+    Parameters:
+    components (List[np.ndarray]): Coordinates of every component.
+    padding (float): Space between components relative to the largest component extent.
+
+    Returns:
+    List[np.ndarray]: Moved coordinates of every component.
+    """
+    lows = [c.min(axis=0) if len(c) else np.zeros(2) for c in components]
+    sizes = [c.max(axis=0) - low if len(c) else np.zeros(2) for c, low in zip(components, lows)]
+    gap = padding * max((size.max() for size in sizes), default=0.0) or 1.0
+    boxes = [size + gap for size in sizes]
+    # Shelves are about as wide as a square holding all components
+    shelf_width = max(np.sqrt(sum(box[0] * box[1] for box in boxes)), max((box[0] for box in boxes), default=0.0))
+
+    packed = [None] * len(components)
+    x, y, shelf_height = 0.0, 0.0, 0.0
+    for i in sorted(range(len(components)), key=lambda i: -boxes[i][1]):
+        width, height = boxes[i]
+        if x > 0 and x + width > shelf_width:
+            x, y, shelf_height = 0.0, y - shelf_height, 0.0
+        packed[i] = components[i] - lows[i] + (x, y - height)
+        x += width
+        shelf_height = max(shelf_height, height)
+    return packed
+
+
+def get_warm_start(
+    model: StructureModel,
+    structure_model: StructureModel,
+    previous_sectors: List[str],
+    previous_layout: str,
+    seed: int,
+) -> Tuple[Union[np.ndarray, None], Union[np.ndarray, None]]:
+    """
+    Get initial positions of a layout from the previously shown layout.
+
+    Nodes shown before keep their previous position, new nodes start close to their placed neighbours.
+
+    Parameters:
+    model (StructureModel): Model of the selected sectors.
+    structure_model (StructureModel): Overview model of all sectors.
+    previous_sectors (List[str]): Sectors of the previously shown graph.
+    previous_layout (str): Key of the previously shown layout.
+    seed (int): Seed for placing new nodes without placed neighbours.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Initial positions and mask of fixed nodes, (None, None) if no previous layout can
+    be used.
+    """
+    if not previous_sectors or not layouts.is_layout_key(previous_layout):
+        return None, None
+    previous_model = structure_model.subgraph(previous_sectors)
+    previous_graph = ig.Graph(n=len(previous_model), edges=previous_model.edges)
+    # Drafts are replaced by their refined layout, their rough positions are not kept
+    if previous_layout == layouts.get_layout_key(previous_graph, "draft", seed):
+        return None, None
+    coords = layouts.peek_layout(previous_layout)
+    if coords is None or len(coords) != len(previous_model):
+        return None, None
+
+    initial = np.zeros((len(model), 2))
+    fixed = np.zeros(len(model), dtype=bool)
+    for node_id, name in enumerate(model.names):
+        previous_id = previous_model.ids.get(name)
+        if previous_id is not None:
+            initial[node_id] = coords[previous_id]
+            fixed[node_id] = True
+    if not fixed.any():
+        return None, None
+
+    rng = np.random.default_rng(seed)
+    low, high = coords.min(axis=0), coords.max(axis=0)
+    spread = 0.05 * max((high - low).max(), 1.0)
+    for node_id in np.flatnonzero(~fixed):
+        neighbours = np.concatenate([model.successors(node_id), model.predecessors(node_id)])
+        neighbours = neighbours[fixed[neighbours]]
+        if len(neighbours):
+            initial[node_id] = initial[neighbours].mean(axis=0) + rng.normal(scale=spread, size=2)
+        else:
+            initial[node_id] = rng.uniform(low, high)
+    return initial, fixed
+
 
 def generate_layout(G: ig.Graph, algorithm: str) -> ig.Layout:
     """
     Generate the layout for the graph according to the selected algorithm.
 
+    Layouts are computed with a fixed seed and cached by graph fingerprint, so that repeated views of the same graph
+    are served from memory or disk.
+
     Parameters:
     G (ig.Graph): The graph for generating the layout.
     algorithm (str): The selected algorithm for generating the layout.
@@ -216,24 +543,91 @@ def generate_layout(G: ig.Graph, algorithm: str) -> ig.Layout:
     Returns:
     ig.Layout: The generated layout.
     """
+    return layouts.get_layout(G, algorithm, compute_layout)
+
+
+def compute_layout(
+    G: ig.Graph, algorithm: str, seed: int, initial: np.ndarray = None, fixed: np.ndarray = None
+) -> ig.Layout:
+    """
+    Compute the layout for the graph according to the selected algorithm.
+
+    Parameters:
+    G (ig.Graph): The graph for generating the layout.
+    algorithm (str): The selected algorithm for generating the layout.
+    seed (int): Seed of the random number generator, equal seeds result in equal layouts.
+    initial (np.ndarray, optional): Initial positions to warm-start from, which needs fewer iterations.
+    fixed (np.ndarray, optional): Mask of nodes keeping their initial position.
+
+    Returns:
+    ig.Layout: The generated layout.
+    """
+    if initial is not None:
+        return compute_warm_layout(G, algorithm, seed, initial, fixed)
+
     # Rejected layout algorithms
-    # “drl”: G.layout_drl, # very bundled, not clear
+    # “drl”: G.layout_drl, # very bundled, not clear, slower than "fr_grid" on SEDOS structures
     # “mds”: G.layout_mds, # cornered, not clear
     # "lgl": G.layout_lgl, # two-dimensional connection
     # "umap": G.layout_umap, # not working properly
     # "dav": G.layout_davidson_harel, # not working properly
 
     layout_mapping_with_dim = {
-        "kk": G.layout_kamada_kawai,  #1 clear centrality, radial edges
-        "fr": G.layout_fruchterman_reingold,  #2 clear centrality,
+        "kk": G.layout_kamada_kawai,  # 1 clear centrality, radial edges
+        "fr": G.layout_fruchterman_reingold,  # 2 clear centrality,
+        "fr_grid": lambda dim: G.layout_fruchterman_reingold(dim=dim, grid=True),  # fast fallback for large graphs
+        "draft": lambda dim: G.layout_fruchterman_reingold(dim=dim, grid=True, niter=DRAFT_ITERATIONS),
     }
     layout_mapping_without_dim = {
-        "go": G.layout_graphopt, #3 fast, very distributed and less sorted nodes
+        "go": G.layout_graphopt,  # 3 fast, very distributed and less sorted nodes
     }
-    if algorithm in layout_mapping_with_dim:
-        return layout_mapping_with_dim[algorithm](dim=2)
-    elif algorithm in layout_mapping_without_dim:
-        return layout_mapping_without_dim[algorithm]()
+    with layouts.seeded_random(seed):
+        if algorithm in layout_mapping_with_dim:
+            return layout_mapping_with_dim[algorithm](dim=2)
+        elif algorithm in layout_mapping_without_dim:
+            return layout_mapping_without_dim[algorithm]()
+
+
+def compute_warm_layout(
+    G: ig.Graph, algorithm: str, seed: int, initial: np.ndarray, fixed: np.ndarray = None
+) -> ig.Layout:
+    """
+    Compute a layout starting from initial positions with a reduced number of iterations.
+
+    Parameters:
+    G (ig.Graph): The graph for generating the layout.
+    algorithm (str): The selected algorithm for generating the layout.
+    seed (int): Seed of the random number generator.
+    initial (np.ndarray): Initial positions of all nodes.
+    fixed (np.ndarray, optional): Mask of nodes keeping their initial position.
+
+    Returns:
+    ig.Layout: The generated layout.
+    """
+    if fixed is not None and fixed.all():
+        return ig.Layout(initial.tolist())
+    kwargs = {"seed": initial.tolist()}
+    if fixed is not None and algorithm in ("fr", "fr_grid", "draft", "kk"):
+        # Nodes are pinned by bounding them to their initial position
+        inf = float("inf")
+        kwargs["minx"] = np.where(fixed, initial[:, 0], -inf).tolist()
+        kwargs["maxx"] = np.where(fixed, initial[:, 0], inf).tolist()
+        kwargs["miny"] = np.where(fixed, initial[:, 1], -inf).tolist()
+        kwargs["maxy"] = np.where(fixed, initial[:, 1], inf).tolist()
+    with layouts.seeded_random(seed):
+        if algorithm in ("fr", "fr_grid", "draft"):
+            grid = "auto" if algorithm == "fr" else "grid"
+            return G.layout_fruchterman_reingold(niter=WARM_START_ITERATIONS, dim=2, grid=grid, **kwargs)
+        elif algorithm == "kk":
+            return G.layout_kamada_kawai(maxiter=WARM_START_ITERATIONS * max(G.vcount(), 1) // 10, dim=2, **kwargs)
+        elif algorithm == "go":
+            layout = G.layout_graphopt(niter=WARM_START_ITERATIONS, **kwargs)
+            if fixed is not None:
+                # graphopt has no bounds, fixed nodes are moved back to their initial position
+                coords = np.asarray(layout.coords)
+                coords[fixed] = initial[fixed]
+                layout = ig.Layout(coords.tolist())
+            return layout
 
 
 def get_node_attributes(nodes: List[str], processes: List[str]) -> Tuple[List[str], List[str], List[str]]:
@@ -255,6 +649,7 @@ def get_node_attributes(nodes: List[str], processes: List[str]) -> Tuple[List[st
 
     return labels, node_colors, node_shapes
 
+
 def assign_color(node: str, processes: List[str]) -> str:
     """
     Assign a color to each node based on its sector or type.
@@ -302,39 +697,9 @@ def assign_shape(node: str, processes: List[str]) -> str:
     return "square" if node in processes else "circle"
 
 
-def calculate_offset(sector: str, algorithm: str) -> Tuple[int, int]:
-    """
-    Calculate the offset for each sector so that the nodes of different sectors do not overlap.
-
-    Parameters:
-    sector (str): The sector for which nodes the offset is calculated.
-    algorithm (str): The selected algorithm for generating the layout.
-
-    Returns:
-    Tuple[int, int]: The x and y offsets for the sector nodes.
-    """
-    offset_values = {
-        "dav": 200,
-        "drl": 0,
-        "fr": 20,
-        "go": 500,
-        "kk": 15,
-        "lgl": 1500000,
-        "mds": 20,
-        "umap": 20,
-    }
-    offset = offset_values.get(algorithm, 0)
-    sector_offsets = {
-        "x2x": (0, 0),
-        "pow": (offset, offset),
-        "ind": (offset, -offset),
-        "tra": (-offset, offset),
-        "hea": (-offset, -offset),
-    }
-    return sector_offsets.get(sector, (0, 0))
-
-def get_node_coordinates(layout: ig.Layout, num_nodes: int, x_offset: int, y_offset: int) -> Tuple[
-    List[float], List[float]]:
+def get_node_coordinates(
+    layout: ig.Layout, num_nodes: int, x_offset: int, y_offset: int
+) -> Tuple[List[float], List[float]]:
     """
     Get coordinates for nodes with the given layout and offsets.
 
@@ -354,8 +719,9 @@ def get_node_coordinates(layout: ig.Layout, num_nodes: int, x_offset: int, y_off
     return Xn, Yn
 
 
-def get_edge_coordinates(layout: ig.Layout, edges: List[Tuple[int, int]], x_offset: int, y_offset: int) -> Tuple[
-    List[float], List[float]]:
+def get_edge_coordinates(
+    layout: ig.Layout, edges: List[Tuple[int, int]], x_offset: int, y_offset: int
+) -> Tuple[List[float], List[float]]:
     """
     Get coordinates for edges with the given layout and offsets.
 
@@ -375,6 +741,110 @@ def get_edge_coordinates(layout: ig.Layout, edges: List[Tuple[int, int]], x_offs
     return Xe, Ye
 
 
+def group_edges_by_width(edges: List[Tuple[int, int]], weights: dict) -> List[Tuple[float, List[Tuple[int, int]]]]:
+    """
+    Group edges by line width according to the number of parallel edges collapsed into them, see EDGE_WIDTHS.
+
+    Parameters:
+    edges (List[Tuple[int, int]]): The list of edges.
+    weights (dict): Multiplicity per edge.
+
+    Returns:
+    List[Tuple[float, List[Tuple[int, int]]]]: Line width and edges per group, groups without edges are left out.
+    At least the group of the thinnest lines is returned, so that there always is an edge trace.
+    """
+    minimums = [minimum for minimum, _ in EDGE_WIDTHS]
+    groups = [[] for _ in EDGE_WIDTHS]
+    for edge in edges:
+        groups[bisect.bisect_right(minimums, weights.get(edge, 1)) - 1].append(edge)
+    return [(width, group) for i, ((_, width), group) in enumerate(zip(EDGE_WIDTHS, groups)) if group or i == 0]
+
+
+def use_webgl(num_nodes: int, num_edges: int, render: str) -> bool:
+    """
+    Decide whether the graph is rendered with WebGL instead of SVG.
+
+    Parameters:
+    num_nodes (int): The number of nodes.
+    num_edges (int): The number of edges.
+    render (str): "svg" and "webgl" force the renderer, "auto" uses WebGL above WEBGL_THRESHOLD nodes and edges.
+
+    Returns:
+    bool: True if WebGL traces should be used.
+    """
+    if render == "webgl":
+        return True
+    if render == "svg":
+        return False
+    return num_nodes + num_edges > app_settings.WEBGL_THRESHOLD
+
+
+def get_arrow_coordinates(
+    layout: ig.Layout, edges: List[Tuple[int, int]], x_offset: int, y_offset: int
+) -> Tuple[List[float], List[float]]:
+    """
+    Get coordinates for edges with arrowheads drawn as line segments.
+
+    WebGL traces do not support rotated arrow markers, so each edge is drawn as a line followed by two short barbs
+    close to its target node.
+
+    Parameters:
+    layout (ig.Layout): The layout of the nodes.
+    edges (List[Tuple[int, int]]): The list of edges.
+    x_offset (int): The x offset for the edges.
+    y_offset (int): The y offset for the edges.
+
+    Returns:
+    Tuple[List[float], List[float]]: X and Y coordinates of edges and arrowheads, separated by None.
+    """
+    if not edges:
+        return [], []
+    coords = np.asarray(layout.coords, dtype=float) + (x_offset, y_offset)
+    edge_array = np.asarray(edges)
+    source, target = coords[edge_array[:, 0]], coords[edge_array[:, 1]]
+    direction = target - source
+    length = np.hypot(direction[:, 0], direction[:, 1])[:, None]
+    direction = np.divide(direction, length, out=np.zeros_like(direction), where=length > 0)
+    # Arrowheads scale with the extent of the graph and stay clear of the target node marker
+    size = 0.01 * np.ptp(coords, axis=0).max()
+    tip = target - direction * np.minimum(size, length / 2)
+    angle = np.radians(25)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    left = tip - size * direction @ rotation.T
+    right = tip - size * direction @ rotation
+    gap = np.full(len(edges), np.nan)
+    segments = [source, target, gap, left, tip, right, gap]
+    Xe = np.column_stack([segment if segment is gap else segment[:, 0] for segment in segments]).ravel()
+    Ye = np.column_stack([segment if segment is gap else segment[:, 1] for segment in segments]).ravel()
+    # Plotly breaks lines at None
+    return (
+        [None if np.isnan(x) else x for x in Xe.tolist()],
+        [None if np.isnan(y) else y for y in Ye.tolist()],
+    )
+
+
+def create_edge_trace_gl(Xe: List[float], Ye: List[float]) -> go.Scattergl:
+    """
+    Create a WebGL trace for edges with arrowheads, see get_arrow_coordinates.
+
+    Parameters:
+    Xe (List[float]): X coordinates of edges and arrowheads.
+    Ye (List[float]): Y coordinates of edges and arrowheads.
+
+    Returns:
+    go.Scattergl: The edge trace.
+    """
+    return go.Scattergl(
+        x=Xe,
+        y=Ye,
+        mode="lines",
+        line=dict(color="rgb(160,160,160)", width=0.5),
+        hoverinfo="none",
+        showlegend=True,
+        name="edges",
+    )
+
+
 def create_edge_trace(Xe: List[float], Ye: List[float]) -> go.Scatter:
     """
     Create a Plotly trace for edges with arrows.
@@ -395,19 +865,28 @@ def create_edge_trace(Xe: List[float], Ye: List[float]) -> go.Scatter:
             size=6,  # Adjust size as needed
             color="rgb(0,0,0)",  # Fill color
             symbol="arrow-bar-up",
-            angleref='previous',
+            angleref="previous",
             angle=0,
-            line=dict(color="rgb(255,255,255)", width=0)  # Border color and width
+            line=dict(color="rgb(255,255,255)", width=0),  # Border color and width
         ),
         hoverinfo="none",
         showlegend=True,
-        name=f'edges'
+        name="edges",
     )
 
 
-def create_node_traces_by_color(Xn: List[float], Yn: List[float], labels: List[str], shapes: List[str],
-                                colors: List[str], processes: List[str], sizes: List[int] = None,
-                                mode: str = "markers") -> List[go.Scatter]:
+def create_node_traces_by_color(
+    Xn: List[float],
+    Yn: List[float],
+    labels: List[str],
+    shapes: List[str],
+    colors: List[str],
+    processes: List[str],
+    sizes: List[int] = None,
+    mode: str = "markers",
+    trace_type: type = go.Scatter,
+    opacities: List[float] = None,
+) -> List[go.Scatter]:
     """
     Create Plotly traces for nodes, differentiating by color.
 
@@ -420,6 +899,8 @@ def create_node_traces_by_color(Xn: List[float], Yn: List[float], labels: List[s
     processes (List[str]): List of processes.
     sizes (List[int], optional): Sizes of the nodes. Defaults to None.
     mode (str, optional): Mode for the trace. Defaults to "markers".
+    trace_type (type, optional): go.Scatter for SVG or go.Scattergl for WebGL traces. Defaults to go.Scatter.
+    opacities (List[float], optional): Opacities of the nodes. Defaults to None.
 
     Returns:
     List[go.Scatter]: List of node traces.
@@ -434,6 +915,7 @@ def create_node_traces_by_color(Xn: List[float], Yn: List[float], labels: List[s
         trace_Yn = [Yn[i] for i in indices]
         trace_labels = [labels[i] for i in indices]
         trace_shapes = [shapes[i] for i in indices]
+        trace_opacities = [opacities[i] for i in indices] if opacities is not None else None
         legend_name = trace_labels[0][:3]
         legend_entry = (legend_name, color)
 
@@ -443,7 +925,7 @@ def create_node_traces_by_color(Xn: List[float], Yn: List[float], labels: List[s
         else:
             show_legend = False
 
-        node_trace = go.Scatter(
+        node_trace = trace_type(
             x=trace_Xn,
             y=trace_Yn,
             mode=mode,
@@ -452,12 +934,13 @@ def create_node_traces_by_color(Xn: List[float], Yn: List[float], labels: List[s
                 symbol=trace_shapes,
                 size=8,
                 color=color,
+                opacity=trace_opacities,
                 line=dict(color="rgb(50,50,50)", width=0.5),
             ),
             text=trace_labels,
             hoverinfo="text",
             showlegend=show_legend,
-            legendgroup=legend_name
+            legendgroup=legend_name,
         )
         node_traces.append(node_trace)
 
@@ -518,76 +1001,86 @@ def update_layout_with_unique_legend(fig: go.Figure, predefined_order: List[str]
 
     return fig
 
-def generate_trace_process_specific(updated_process_set, process_name):
+
+def get_ego_network(structure_index: StructureModel, name: str, radius: int, direction: str) -> dict:
+    """
+    Get the subgraph induced by all nodes within a number of edges from a process or commodity.
+
+    Parameters:
+    structure_index (StructureModel): Model of the process set, see build_structure_index.
+    name (str): Name of the process or commodity in the center.
+    radius (int): Maximum number of edges between the center and a node. Process and commodity nodes alternate, so
+        radius 2 reaches the processes next to a commodity.
+    direction (str): "upstream" follows edges against their direction, "downstream" along their direction and "both"
+        combines upstream and downstream nodes.
+
+    Returns:
+    dict: Nodes with their name, type and distance from the center, and edges between them as (source, target) names.
+    """
+    center = structure_index.ids[name]
+    graph = structure_index.graph
+    modes = EGO_DIRECTIONS[direction]
+    distances = {}
+    for mode in modes:
+        # Breadth-first search visits nodes by distance, so it stops at the first node beyond the radius
+        for vertex, distance, _ in graph.bfsiter(center, mode=mode, advanced=True):
+            if distance > radius:
+                break
+            distances[vertex.index] = min(distance, distances.get(vertex.index, distance))
+    node_ids = sorted(distances, key=lambda node_id: (distances[node_id], structure_index.names[node_id]))
+    subgraph = graph.induced_subgraph(node_ids, implementation="create_from_scratch")
+    # induced_subgraph numbers nodes by their original ids
+    subgraph_names = [structure_index.names[node_id] for node_id in sorted(node_ids)]
+    return {
+        "nodes": [
+            {
+                "name": structure_index.names[node_id],
+                "type": "process" if structure_index.is_process[node_id] else "commodity",
+                "distance": int(distances[node_id]),
+            }
+            for node_id in node_ids
+        ],
+        "edges": sorted(dict.fromkeys((subgraph_names[s], subgraph_names[t]) for s, t in subgraph.get_edgelist())),
+    }
+
+
+def generate_trace_process_specific(updated_process_set, process_name, structure_index=None):
     """
     Generates the trace for the selected process.
 
     Parameters
     ----------
     process_name: str
-        The selected process, which is used to filter the process set.
+        The selected process. If no process has exactly this name, all processes starting with it are shown.
     updated_process_set: pd.DataFrame
         The DataFrame containing the process set.
+    structure_index: StructureModel
+        Prebuilt model of the process set, see build_structure_index.
 
     Returns
     -------
     list
         The combined trace of nodes and edges, including their colors and shapes.
     """
-    # Filter the process set for the selected process
-    filtered_process_set = updated_process_set[updated_process_set["process"].str.startswith(process_name)]
-
-    # Initialize the lists for the inputs, outputs, and processes
-    inputs = filtered_process_set["input"].tolist()
-    outputs = filtered_process_set["output"].tolist()
-    processes = filtered_process_set["process"].tolist()
+    if structure_index is None:
+        structure_index = build_structure_index(updated_process_set)
+    selected_processes = [structure_index.names[i] for i in structure_index.find_processes(process_name)]
+    process_edges = {
+        process: (structure_index.inputs(process), structure_index.outputs(process)) for process in selected_processes
+    }
 
-    nodes = []
+    # Commodities consumed by any selected process are shown as inputs, all others as outputs
+    input_nodes = list(dict.fromkeys(c for inputs, _ in process_edges.values() for c in inputs))
+    output_nodes = [
+        c for c in dict.fromkeys(c for _, outputs in process_edges.values() for c in outputs) if c not in input_nodes
+    ]
+    nodes = selected_processes + input_nodes + output_nodes
+    node_ids = {node: i for i, node in enumerate(nodes)}
     edges = []
-
-    # Create all nodes and then all edges of the format (source_index, target_index)
-    for i, process in enumerate(processes):
-        input_value = inputs[i]
-        output_value = outputs[i]
-        process_value = processes[i]
-
-        # Parse input, output, and process values correctly
-        input_list = input_value.split(",") if isinstance(input_value, str) else input_value
-        input_list = [item.strip().replace("[", "").replace("]", "") for item in input_list]
-
-        output_list = output_value.split(",") if isinstance(output_value, str) else output_value
-        output_list = [item.strip().replace("[", "").replace("]", "") for item in output_list]
-
-        process_list = process_value.split(",") if isinstance(process_value, str) else process_value
-        process_list = [item.strip().replace("[", "").replace("]", "") for item in process_list]
-
-        nodes.append(process_name)
-
-        for input_node in input_list:
-            input_node = input_node.strip()
-            if input_node not in nodes:
-                nodes.append(input_node)
-            source_index = nodes.index(input_node)
-
-            for process_node in process_list:
-                process_node = process_node.strip()
-                if process_node not in nodes:
-                    nodes.append(process_node)
-                target_index = nodes.index(process_node)
-                edges.append((source_index, target_index))
-
-        for process_node in process_list:
-            process_node = process_node.strip()
-            if process_node not in nodes:
-                nodes.append(process_node)
-            source_index = nodes.index(process_node)
-
-            for output_node in output_list:
-                output_node = output_node.strip()
-                if output_node not in nodes:
-                    nodes.append(output_node)
-                target_index = nodes.index(output_node)
-                edges.append((source_index, target_index))
+    for process, (inputs, outputs) in process_edges.items():
+        edges += [(node_ids[c], node_ids[process]) for c in inputs]
+        edges += [(node_ids[process], node_ids[c]) for c in outputs]
+    process_list = set(selected_processes)
 
     # Initialize the lists for the labels, colors, and shapes of the nodes
     node_colors = [assign_color(node, process_list) for node in nodes]
@@ -595,18 +1088,16 @@ def generate_trace_process_specific(updated_process_set, process_name):
     node_sizes = [15 if node in process_list else 8 for node in nodes]
 
     # The process node should be displayed in the center, the inputs on the left, and the outputs on the right
-    Xn = [0]  # Center node x-coordinate
-    Yn = [0]  # Center node y-coordinate
+    process_ids = [node_ids[node] for node in selected_processes]
+    input_ids = [node_ids[node] for node in input_nodes]
+    output_ids = [node_ids[node] for node in output_nodes]
 
-    # Add coordinates for the input nodes
-    for i in range(len(input_list)):
-        Xn.append(-1)
-        Yn.append(i + 0.5 - len(input_list) / 2)
-
-    # Add coordinates for the output nodes
-    for i in range(len(output_list)):
-        Xn.append(1)
-        Yn.append(i + 0.5 - len(output_list) / 2)
+    Xn = [0.0] * len(nodes)
+    Yn = [0.0] * len(nodes)
+    for x, column_ids in ((-1, input_ids), (0, process_ids), (1, output_ids)):
+        for i, node_id in enumerate(column_ids):
+            Xn[node_id] = x
+            Yn[node_id] = i + 0.5 - len(column_ids) / 2
 
     # Assign the calculated coordinates to the edges
     Xe, Ye = [], []
@@ -643,7 +1134,8 @@ def generate_trace_process_specific(updated_process_set, process_name):
 
     return [edge_trace, node_trace]
 
-def generate_trace_commodity_specific(updated_process_set, commodity_name, selected_sectors):
+
+def generate_trace_commodity_specific(updated_process_set, commodity_name, selected_sectors, structure_index=None):
     """
     Generates the trace for the selected commodity. All processes that produce the selected commodity are displayed to
     the left of the commodity, all processes that consume the selected commodity are displayed to the right of the
@@ -652,57 +1144,34 @@ def generate_trace_commodity_specific(updated_process_set, commodity_name, selec
     Parameters
     ----------
     commodity_name: str
-        The selected commodity, which is used to filter the process set.
+        The selected commodity, processes are looked up by its exact name.
     selected_sectors: list
-        The selected sectors, which are used to filter the process set.
-    file: str
-        The path to the Excel file of the Model Structure.
+        The selected sectors, which are used to filter the processes.
+    structure_index: StructureModel
+        Prebuilt model of the process set, see build_structure_index.
 
     Returns
     -------
     list
         The combined trace of nodes and edges, including their colours and shapes."""
-
-    # filter process set for the selected sectors
-    updated_process_set = updated_process_set[updated_process_set["process"].str.startswith(tuple(selected_sectors))]
-
-    # filter the process set to only include processes that produce or consume the selected commodity
-    filtered_process_set = updated_process_set[
-        (updated_process_set["input"].str.contains(commodity_name))
-        | (updated_process_set["output"].str.contains(commodity_name))
+    if structure_index is None:
+        structure_index = build_structure_index(updated_process_set)
+    sector_prefixes = tuple(selected_sectors)
+
+    # processes doing both, consuming and producing the commodity, are shown as consumers
+    process_input = [p for p in structure_index.consumers(commodity_name) if p.startswith(sector_prefixes)]
+    process_output = [
+        p
+        for p in structure_index.producers(commodity_name)
+        if p.startswith(sector_prefixes) and p not in process_input
     ]
+    processes = set(process_input + process_output)
 
-    # get the inputs, outputs and processes of the filtered process set
-    inputs = filtered_process_set["input"].tolist()
-    outputs = filtered_process_set["output"].tolist()
-    processes = filtered_process_set["process"].tolist()
-
-    nodes = []
-    edges = []
-
-    # add the selected commodity to the nodes list
-    nodes.append(commodity_name)
-
-    process_input = []
-    process_output = []
-
-    # create all nodes and then all edges of the format (source_index, target_index)
-    for i, process in enumerate(processes):
-        input_value = inputs[i]
-        output_value = outputs[i]
-        process_value = processes[i]
-
-        # if the commodity is an input of the process, the process is added to the nodes list and the edge is added to
-        # the edges list if the commodity is an output of the process, the process is added to the nodes list and the
-        # edge is added to the edges list
-        if commodity_name in input_value:
-            nodes.append(process_value)
-            edges.append((nodes.index(commodity_name), nodes.index(process_value)))
-            process_input.append(process_value)
-        elif commodity_name in output_value:
-            nodes.append(process_value)
-            edges.append((nodes.index(process_value), nodes.index(commodity_name)))
-            process_output.append(process_value)
+    # add the selected commodity and its processes to the nodes list and create all edges of the format
+    # (source_index, target_index)
+    nodes = [commodity_name] + process_input + process_output
+    edges = [(0, i) for i in range(1, len(process_input) + 1)]
+    edges += [(i, 0) for i in range(len(process_input) + 1, len(nodes))]
 
     # initialize the lists for the colors and shapes of the nodes
     node_color = []
@@ -714,28 +1183,14 @@ def generate_trace_commodity_specific(updated_process_set, commodity_name, selec
 
     # the commodity node should be displayed in the center, the processes where it is an output on the left and the
     # processes where it is an input on the right the appropriate coordinates have to be assigned to each node
-
-    Xn = []
-    Yn = []
-
-    # add coordinates of the commodity node
-    Xn += [0]
-    Yn += [0]
-
-    # we need two counters, one for the inputs and one for the outputs, to calculate the y-coordinates of the
-    # processes, as i iterates over the node list
-    j = 0
-    k = 0
-
-    for i in range(len(nodes)):
-        if nodes[i] in process_input:
-            Xn += [len(process_input) + len(process_output)]
-            Yn += [j + 0.5 - len(process_input) / 2]
-            j += 1
-        elif nodes[i] in process_output:
-            Xn += [-len(process_output) - len(process_input)]
-            Yn += [k + 0.5 - len(process_output) / 2]
-            k += 1
+    Xn = [0]
+    Yn = [0]
+    for j in range(len(process_input)):
+        Xn += [len(process_input) + len(process_output)]
+        Yn += [j + 0.5 - len(process_input) / 2]
+    for k in range(len(process_output)):
+        Xn += [-len(process_output) - len(process_input)]
+        Yn += [k + 0.5 - len(process_output) / 2]
 
     # assign the calculated coordinates to the edges
     Xe = []
@@ -775,7 +1230,10 @@ def generate_trace_commodity_specific(updated_process_set, commodity_name, selec
 
 
 # ### unused functions?
-# def create_node_trace(Xn: List[float], Yn: List[float], labels: List[str], shapes: List[str], colors: List[str], processes: List[str], sizes: List[int] = None, mode: str = "markers") -> go.Scatter:
+# def create_node_trace(
+#     Xn: List[float], Yn: List[float], labels: List[str], shapes: List[str], colors: List[str], processes: List[str],
+#     sizes: List[int] = None, mode: str = "markers"
+# ) -> go.Scatter:
 #     """
 #     Create a Plotly trace for nodes.
 #
@@ -899,4 +1357,4 @@ def generate_trace_commodity_specific(updated_process_set, commodity_name, selec
 #         Yn.append(k + 0.5 - num_outputs / 2)
 #         k += 1
 #
-#     return Xn, Yn
\ No newline at end of file
+#     return Xn, Yn
@@ -0,0 +1,152 @@
+"""Prefix tree of process names, which groups processes by their nomenclature at every level."""
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+
+class NomenclatureNode:
+    """
+    Node of the nomenclature tree, named by the underscore-joined parts of the path from the root.
+
+    Attributes
+    ----------
+    name: str
+        Process name prefix, like "pow_combustion".
+    depth: int
+        Number of nomenclature parts of the name.
+    children: dict
+        Child nodes keyed by their next nomenclature part.
+    is_process: bool
+        Whether a process is named exactly like this node.
+    inputs, outputs: set
+        Commodities of processes named exactly like this node.
+    subtree_inputs, subtree_outputs: set
+        Commodities of all processes within the subtree of this node.
+    """
+
+    __slots__ = (
+        "name",
+        "depth",
+        "children",
+        "is_process",
+        "inputs",
+        "outputs",
+        "subtree_inputs",
+        "subtree_outputs",
+    )
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.children: Dict[str, NomenclatureNode] = {}
+        self.is_process = False
+        self.inputs: Set[str] = set()
+        self.outputs: Set[str] = set()
+        self.subtree_inputs: Set[str] = set()
+        self.subtree_outputs: Set[str] = set()
+
+
+class NomenclatureTree:
+    """
+    Prefix tree of all process names split at underscores, holding the combined commodities of every prefix.
+
+    Grouping processes at a nomenclature level keeps the first parts of every process name up to that level and
+    combines the commodities of all processes sharing the shortened name. At level n, a node at depth n therefore
+    stands for its whole subtree, while a process with fewer parts stands for itself only.
+
+    Methods
+    ----------
+    __init__(process_set: pd.DataFrame)
+        Builds the tree from a process set with columns "input", "process" and "output".
+    groups(nomenclature_level)
+        Returns grouped process names with their sorted input and output commodities.
+    process_set(nomenclature_level)
+        Returns the groups as process set with comma-separated inputs and outputs.
+    """
+
+    def __init__(self, process_set: pd.DataFrame):
+        self.root = NomenclatureNode("", 0)
+        for process, inputs, outputs in zip(process_set["process"], process_set["input"], process_set["output"]):
+            node = self.root
+            for part in str(process).split("_"):
+                child = node.children.get(part)
+                if child is None:
+                    name = f"{node.name}_{part}" if node.depth else part
+                    child = node.children[part] = NomenclatureNode(name, node.depth + 1)
+                node = child
+            node.is_process = True
+            node.inputs.update(split(inputs))
+            node.outputs.update(split(outputs))
+        self._combine(self.root)
+        self.max_depth = max((node.depth for node in self._walk(self.root)), default=0)
+        self._groups: Dict[int, List[Tuple[str, List[str], List[str]]]] = {}
+
+    def _combine(self, root: NomenclatureNode):
+        # Iterative post-order traversal, children are combined before their parents
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            node.subtree_inputs = set(node.inputs)
+            node.subtree_outputs = set(node.outputs)
+            for child in node.children.values():
+                node.subtree_inputs |= child.subtree_inputs
+                node.subtree_outputs |= child.subtree_outputs
+
+    @staticmethod
+    def _walk(root: NomenclatureNode) -> Iterator[NomenclatureNode]:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
+
+    def groups(self, nomenclature_level: Optional[int]) -> List[Tuple[str, List[str], List[str]]]:
+        """
+        Returns the processes grouped at the given level.
+
+        Parameters
+        ----------
+        nomenclature_level: int
+            Number of nomenclature parts to keep, None keeps full process names.
+
+        Returns
+        -------
+        list
+            Tuples of grouped process name, sorted inputs and sorted outputs, ordered by name.
+        """
+        level = self.max_depth if nomenclature_level is None else min(nomenclature_level, self.max_depth)
+        if level not in self._groups:
+            groups = []
+            stack = list(self.root.children.values())
+            while stack:
+                node = stack.pop()
+                if node.depth == level:
+                    groups.append((node.name, sorted(node.subtree_inputs), sorted(node.subtree_outputs)))
+                    continue
+                if node.is_process:
+                    groups.append((node.name, sorted(node.inputs), sorted(node.outputs)))
+                stack.extend(node.children.values())
+            self._groups[level] = sorted(groups)
+        return self._groups[level]
+
+    def process_set(self, nomenclature_level: Optional[int]) -> pd.DataFrame:
+        """Returns the processes grouped at the given level as process set, see groups."""
+        return pd.DataFrame(
+            [
+                {"process": name, "input": ",".join(inputs), "output": ",".join(outputs)}
+                for name, inputs, outputs in self.groups(nomenclature_level)
+            ],
+            columns=["process", "input", "output"],
+        )
+
+
+def split(value) -> List[str]:
+    """Splits a comma-separated cell of a process set, ignoring missing values and empty entries."""
+    if not isinstance(value, str):
+        return []
+    return [name for name in value.split(",") if name]
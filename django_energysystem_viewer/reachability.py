@@ -0,0 +1,91 @@
+"""Reachability of processes and commodities along the energy flow, precomputed as transitive closure bitsets."""
+
+from typing import Dict, List
+
+import numpy as np
+
+from django_energysystem_viewer.structure_model import StructureModel
+
+DIRECTIONS = ["upstream", "downstream", "both"]
+
+
+class ReachabilityIndex:
+    """
+    Transitive closure of a structure model for constant time upstream and downstream queries.
+
+    Nodes on cycles (like storages feeding back into their own input commodity) reach each other, so the graph is
+    condensed into strongly connected components first. The condensation is acyclic and its closure is computed in a
+    single pass in topological order, holding the reachable components of every component as packed bitset.
+
+    Methods
+    ----------
+    __init__(structure_model: StructureModel)
+        Builds the index of the given model.
+    cone(name, direction)
+        Returns a boolean mask over the model's nodes reachable from the node in the given direction.
+    query(name, direction)
+        Returns processes and commodities reachable from the node in the given direction.
+    """
+
+    def __init__(self, structure_model: StructureModel):
+        self.model = structure_model
+        graph = structure_model.graph
+        components = graph.connected_components(mode="strong")
+        self.membership = np.asarray(components.membership, dtype=np.int32)
+        condensation = components.cluster_graph(combine_edges=False)
+        condensation.simplify(loops=True, multiple=True)
+        order = condensation.topological_sorting(mode="out")
+        self.num_components = len(components)
+        successors = condensation.get_adjlist(mode="out")
+        predecessors = condensation.get_adjlist(mode="in")
+        self._downstream = self._closure(reversed(order), successors)
+        self._upstream = self._closure(order, predecessors)
+
+    def _closure(self, order, neighbours: List[List[int]]) -> np.ndarray:
+        # Neighbours of a component are always handled before the component itself
+        closure = np.zeros((self.num_components, (self.num_components + 7) // 8), dtype=np.uint8)
+        for component in order:
+            row = closure[component]
+            row[component // 8] |= np.uint8(0x80 >> (component % 8))
+            for neighbour in neighbours[component]:
+                row |= closure[neighbour]
+        return closure
+
+    def _component_mask(self, closure: np.ndarray, component: int) -> np.ndarray:
+        return np.unpackbits(closure[component], count=self.num_components).astype(bool)
+
+    def cone(self, name: str, direction: str) -> np.ndarray:
+        """
+        Returns a boolean mask over the nodes of the model, which are reachable from the node (including itself).
+
+        Parameters
+        ----------
+        name: str
+            Name of a process or commodity.
+        direction: str
+            "upstream" for nodes feeding into the node, "downstream" for nodes fed by the node, "both" for the union.
+
+        Returns
+        -------
+        np.ndarray
+            Mask by node id, all False if the node is unknown.
+        """
+        node_id = self.model.ids.get(name)
+        if node_id is None:
+            return np.zeros(len(self.model), dtype=bool)
+        component = self.membership[node_id]
+        mask = np.zeros(self.num_components, dtype=bool)
+        if direction in ("upstream", "both"):
+            mask |= self._component_mask(self._upstream, component)
+        if direction in ("downstream", "both"):
+            mask |= self._component_mask(self._downstream, component)
+        return mask[self.membership]
+
+    def query(self, name: str, direction: str) -> Dict[str, List[str]]:
+        """Returns names of processes and commodities within the cone of a node, see cone."""
+        mask = self.cone(name, direction)
+        node_ids = np.flatnonzero(mask)
+        return {
+            "processes": sorted(self.model.names[i] for i in node_ids if self.model.is_process[i]),
+            "commodities": sorted(self.model.names[i] for i in node_ids if not self.model.is_process[i]),
+        }
@@ -1 +1,32 @@
+import pathlib
+import tempfile
+
+from django.conf import settings
+
 VERSION = "0.10.1"
+
+# Maximum number of parsed structure sheets kept in memory per process
+STRUCTURE_CACHE_SIZE = getattr(settings, "ENERGYSYSTEM_VIEWER_STRUCTURE_CACHE_SIZE", 32)
+# Publish structures parsed by one worker as memory-mapped sidecar files, which all other workers share
+PUBLISH_STRUCTURES = getattr(settings, "ENERGYSYSTEM_VIEWER_PUBLISH_STRUCTURES", True)
+
+# Folder for persistent caches like graph layouts, set to None to keep caches in memory only
+CACHE_DIR = getattr(
+    settings, "ENERGYSYSTEM_VIEWER_CACHE_DIR", pathlib.Path(tempfile.gettempdir()) / "django_energysystem_viewer"
+)
+# Maximum number of graph layouts kept in memory per process
+LAYOUT_CACHE_SIZE = getattr(settings, "ENERGYSYSTEM_VIEWER_LAYOUT_CACHE_SIZE", 128)
+# Maximum number of warm-started layouts kept in the cache folder, the least recently used are removed first
+WARM_LAYOUT_FILES = getattr(settings, "ENERGYSYSTEM_VIEWER_WARM_LAYOUT_FILES", 256)
+# Number of worker processes computing independent layouts in parallel, like the sectors of separated graphs. Every
+# server worker process starts its own pool, so the total is this number times the number of server workers.
+LAYOUT_PROCESSES = getattr(settings, "ENERGYSYSTEM_VIEWER_LAYOUT_PROCESSES", 2)
+# Seed of the random number generator used by layout algorithms, so that layouts are reproducible
+LAYOUT_SEED = getattr(settings, "ENERGYSYSTEM_VIEWER_LAYOUT_SEED", 42)
+# Network graphs with more nodes and edges than this are rendered with WebGL instead of SVG
+WEBGL_THRESHOLD = getattr(settings, "ENERGYSYSTEM_VIEWER_WEBGL_THRESHOLD", 2000)
+# Seconds a network layout may take per request, cheaper layout algorithms are used for graphs exceeding it
+LAYOUT_TIME_BUDGET = getattr(settings, "ENERGYSYSTEM_VIEWER_LAYOUT_TIME_BUDGET", 10.0)
+# Layouts estimated to take longer than this many seconds are first shown as draft, while the layout is computed in
+# the background; set to None to always wait for the layout
+PROGRESSIVE_LAYOUT_SECONDS = getattr(settings, "ENERGYSYSTEM_VIEWER_PROGRESSIVE_LAYOUT_SECONDS", 1.0)
@@ -0,0 +1,240 @@
+"""Compact graph model of processes and commodities of a structure using integer node ids."""
+
+import bisect
+from itertools import chain, product
+from typing import Dict, List, Sequence, Set, Tuple
+
+import igraph as ig
+import numpy as np
+import pandas as pd
+
+SECTORS = ["pow", "x2x", "ind", "tra", "hea", "hel"]
+
+
+def split_commodities(value: str, merge_orig: bool = False, exclude_prefixes: Tuple[str, ...] = ()) -> List[str]:
+    """
+    Splits a comma-separated cell of the process set into clean names.
+
+    Parameters
+    ----------
+    value: str
+        Cell value, like "[sec_elec, sec_elec_orig]". Missing values result in an empty list.
+    merge_orig: bool
+        Removes "_orig" from names, so that original and derived commodities are merged into one node.
+    exclude_prefixes: tuple
+        Names starting with one of these prefixes are dropped.
+
+    Returns
+    -------
+    list
+        The names within the cell.
+    """
+    if not isinstance(value, str):
+        return []
+    names = []
+    for name in value.split(","):
+        name = name.strip().replace("[", "").replace("]", "").strip()
+        if merge_orig:
+            name = name.replace("_orig", "")
+        if name and not name.startswith(exclude_prefixes):
+            names.append(name)
+    return names
+
+
+class StructureModel:
+    """
+    Directed graph of commodities and processes, where every node is interned to an integer id.
+
+    Edges always connect a commodity with a process, either from an input commodity to a process or from a process
+    to an output commodity. They are held as int32 arrays, adjacency lists in CSR format are built on first use.
+    Parallel edges, like those of processes listed in several rows, are collapsed into one edge with a weight.
+
+    Attributes
+    ----------
+    names: list
+        Node names, the position in the list is the node id.
+    ids: dict
+        Node id per node name.
+    is_process: np.ndarray
+        Whether a node is a process (True) or a commodity (False).
+    sectors: np.ndarray
+        Index of the sector in SECTORS for processes, -1 for commodities and processes of other sectors.
+    sources, targets: np.ndarray
+        Node ids of edge sources and targets.
+    weights: np.ndarray
+        Multiplicity of every edge, which is the number of parallel edges collapsed into it.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        is_process: np.ndarray,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray = None,
+    ):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.is_process = np.asarray(is_process, dtype=bool)
+        sector_codes = {sector: i for i, sector in enumerate(SECTORS)}
+        self.sectors = np.array(
+            [sector_codes.get(name[:3], -1) if process else -1 for name, process in zip(names, self.is_process)],
+            dtype=np.int8,
+        )
+        self.sources = np.asarray(sources, dtype=np.int32)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.weights = np.ones(len(self.sources), dtype=np.int32) if weights is None else np.asarray(weights, np.int32)
+        self._successors = None
+        self._predecessors = None
+        self._sorted_processes = None
+        self._graph = None
+
+    @classmethod
+    def from_process_set(
+        cls, process_set: pd.DataFrame, merge_orig: bool = False, exclude_prefixes: Tuple[str, ...] = ()
+    ) -> "StructureModel":
+        """
+        Builds the model from a process set in a single pass over its rows, collapsing parallel edges.
+
+        Parameters
+        ----------
+        process_set: pd.DataFrame
+            Process set with columns "input", "process" and "output".
+        merge_orig: bool
+            Merges "_orig" commodities into their derived commodities, see split_commodities.
+        exclude_prefixes: tuple
+            Commodities starting with one of these prefixes are left out.
+
+        Returns
+        -------
+        StructureModel
+            The model of the process set.
+        """
+        ids, names, is_process = {}, [], []
+        # Multiplicity per edge in order of first occurrence
+        edges: Dict[Tuple[int, int], int] = {}
+
+        def intern(name: str, process: bool) -> int:
+            node_id = ids.get(name)
+            if node_id is None:
+                node_id = ids[name] = len(names)
+                names.append(name)
+                is_process.append(process)
+            elif process:
+                is_process[node_id] = True
+            return node_id
+
+        for inputs, processes, outputs in zip(process_set["input"], process_set["process"], process_set["output"]):
+            input_ids = [intern(name, False) for name in split_commodities(inputs, merge_orig, exclude_prefixes)]
+            process_ids = [intern(name, True) for name in split_commodities(processes)]
+            output_ids = [intern(name, False) for name in split_commodities(outputs, merge_orig, exclude_prefixes)]
+            for process_id in process_ids:
+                for edge in chain(product(input_ids, [process_id]), product([process_id], output_ids)):
+                    edges[edge] = edges.get(edge, 0) + 1
+
+        pairs = np.array(list(edges), dtype=np.int32).reshape(-1, 2)
+        weights = np.fromiter(edges.values(), dtype=np.int32, count=len(edges))
+        return cls(names, np.array(is_process, dtype=bool), pairs[:, 0], pairs[:, 1], weights)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def edges(self) -> List[Tuple[int, int]]:
+        return list(zip(self.sources.tolist(), self.targets.tolist()))
+
+    @property
+    def processes(self) -> Set[str]:
+        return {name for name, process in zip(self.names, self.is_process) if process}
+
+    def subgraph(self, selected_sectors: Sequence[str]) -> "StructureModel":
+        """
+        Returns the model reduced to processes of the selected sectors and their commodities.
+
+        Node ids are renumbered, keeping the relative order of nodes and edges.
+        """
+        codes = [SECTORS.index(sector) for sector in selected_sectors if sector in SECTORS]
+        process_mask = np.isin(self.sectors, codes) & self.is_process
+        edge_mask = process_mask[self.sources] | process_mask[self.targets]
+        node_mask = process_mask.copy()
+        node_mask[self.sources[edge_mask]] = True
+        node_mask[self.targets[edge_mask]] = True
+        node_ids = np.flatnonzero(node_mask)
+        new_ids = np.full(len(self.names), -1, dtype=np.int32)
+        new_ids[node_ids] = np.arange(len(node_ids), dtype=np.int32)
+        return StructureModel(
+            [self.names[i] for i in node_ids],
+            self.is_process[node_ids],
+            new_ids[self.sources[edge_mask]],
+            new_ids[self.targets[edge_mask]],
+            self.weights[edge_mask],
+        )
+
+    @property
+    def graph(self) -> ig.Graph:
+        """Directed igraph graph of the model, sharing node ids with the model; built on first use."""
+        if self._graph is None:
+            self._graph = ig.Graph(n=len(self.names), edges=self.edges, directed=True)
+        return self._graph
+
+    def find_processes(self, name: str) -> List[int]:
+        """
+        Returns the id of the process with exactly the given name or, if there is none, the ids of all processes whose
+        names start with it, in alphabetical order.
+        """
+        node_id = self.ids.get(name)
+        if node_id is not None and self.is_process[node_id]:
+            return [node_id]
+        if self._sorted_processes is None:
+            self._sorted_processes = sorted(self.processes)
+        start = bisect.bisect_left(self._sorted_processes, name)
+        matches = []
+        for process in self._sorted_processes[start:]:
+            if not process.startswith(name):
+                break
+            matches.append(self.ids[process])
+        return matches
+
+    def producers(self, commodity: str) -> List[str]:
+        """Returns the processes with the given commodity as output."""
+        return self._neighbour_names(commodity, self.predecessors)
+
+    def consumers(self, commodity: str) -> List[str]:
+        """Returns the processes with the given commodity as input."""
+        return self._neighbour_names(commodity, self.successors)
+
+    def inputs(self, process: str) -> List[str]:
+        """Returns the input commodities of the given process."""
+        return self._neighbour_names(process, self.predecessors)
+
+    def outputs(self, process: str) -> List[str]:
+        """Returns the output commodities of the given process."""
+        return self._neighbour_names(process, self.successors)
+
+    def _neighbour_names(self, name: str, neighbours) -> List[str]:
+        node_id = self.ids.get(name)
+        if node_id is None:
+            return []
+        return [self.names[i] for i in neighbours(node_id).tolist()]
+
+    def _adjacency(self, keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(keys, kind="stable")
+        offsets = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=len(self.names)), out=offsets[1:])
+        return offsets, values[order]
+
+    def successors(self, node_id: int) -> np.ndarray:
+        """Returns ids of the nodes reached by edges leaving the given node."""
+        if self._successors is None:
+            self._successors = self._adjacency(self.sources, self.targets)
+        offsets, neighbours = self._successors
+        start, stop = offsets[node_id], offsets[node_id + 1]
+        return neighbours[start:stop]
+
+    def predecessors(self, node_id: int) -> np.ndarray:
+        """Returns ids of the nodes with edges leading to the given node."""
+        if self._predecessors is None:
+            self._predecessors = self._adjacency(self.targets, self.sources)
+        offsets, neighbours = self._predecessors
+        start, stop = offsets[node_id], offsets[node_id + 1]
+        return neighbours[start:stop]
@@ -0,0 +1,410 @@
+"""Read sheets of SEDOS structure workbooks and cache them per workbook version."""
+
+import logging
+import os
+import pathlib
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from data_adapter import settings as adapter_settings
+from openpyxl import load_workbook
+
+from django_energysystem_viewer import settings
+from django_energysystem_viewer.cache import LRUCache
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+PROCESS_SET = "Process_Set"
+HELPER_SET = "Helper_Set"
+AGGREGATION_MAPPING = "Aggregation_Mapping"
+ABBREVIATIONS = "Abbreviations"
+STRUCTURE_SHEETS = [PROCESS_SET, HELPER_SET, AGGREGATION_MAPPING, ABBREVIATIONS]
+
+# Processes which should not appear in network graphs
+PROCESS_FILTER = ["x2x_import", "x2x_delivery", "helper_sink", "helper_pow_flow", "helper_co2"]
+
+# Columns read from each sheet, either by header name or by position
+SHEET_COLUMNS = {
+    PROCESS_SET: ["input", "process", "output"],
+    HELPER_SET: ["input", "process", "output"],
+    AGGREGATION_MAPPING: [0, 1, 2, 3],
+    ABBREVIATIONS: ["abbreviations", "meaning"],
+}
+
+SIDECAR_SUFFIX = ".structure"
+# Schema metadata key holding the version of the workbook a sidecar file was compiled from
+SIDECAR_VERSION_KEY = b"structure_version"
+# Format of sidecar and derived files, increased whenever their content changes for the same workbook version
+CACHE_FORMAT = 2
+
+# Parsed sheets keyed by (workbook path, sheet name, mtime, size)
+structure_cache = LRUCache(maxsize=settings.STRUCTURE_CACHE_SIZE)
+# Indexes and models built from structure sheets keyed by (workbook path, name, mtime, size)
+derived_cache = LRUCache(maxsize=settings.STRUCTURE_CACHE_SIZE)
+
+
+def get_structure_path(structure_name: str) -> pathlib.Path:
+    """Returns the path to the workbook of the given structure in the structures folder."""
+    return adapter_settings.STRUCTURES_DIR / f"{structure_name}.xlsx"
+
+
+def get_structure_paths() -> List[pathlib.Path]:
+    """Returns the paths of all structure workbooks in the structures folder."""
+    return sorted(
+        file
+        for file in adapter_settings.STRUCTURES_DIR.iterdir()
+        if not file.name.startswith(".") and file.suffix == ".xlsx"
+    )
+
+
+def get_structure_version(path: pathlib.Path) -> Tuple[int, int]:
+    """
+    Returns a version token of a structure workbook.
+
+    The token changes whenever the workbook is replaced or modified, which invalidates all cached data derived from
+    the old file.
+    """
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_sidecar_path(path: pathlib.Path, sheet: str) -> pathlib.Path:
+    """Returns the path of the compiled sidecar file holding the given sheet of a structure workbook."""
+    return path.with_suffix(SIDECAR_SUFFIX) / f"{sheet}.arrow"
+
+
+def get_sidecar_version(version: Tuple[int, int]) -> bytes:
+    """Returns the version stored in sidecar files compiled from the given workbook version."""
+    return "{}:{}:{}".format(CACHE_FORMAT, *version).encode()
+
+
+def normalise_sheet(sheet: str, data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces a structure sheet to the columns used by the viewer and cleans up its values.
+
+    Rows without process are removed from process and helper sets and their commodity lists are stripped from "[",
+    "]", whitespace and missing values, so that inputs and outputs are plain comma-separated strings. Filtered
+    processes are kept, as only network graphs leave them out, see filter_processes.
+
+    Parameters
+    ----------
+    sheet: str
+        Name of the sheet.
+    data: pd.DataFrame
+        The sheet as read from the workbook.
+
+    Returns
+    -------
+    pd.DataFrame
+        The normalised sheet.
+    """
+    if sheet in (PROCESS_SET, HELPER_SET):
+        data = data[["input", "process", "output"]].dropna(subset=["process"])
+        data = data.assign(
+            **{
+                column: data[column].fillna("").astype(str).str.replace(r"[\[\]\s]", "", regex=True)
+                for column in ("input", "output")
+            }
+        )
+        return data.reset_index(drop=True)
+    if sheet == AGGREGATION_MAPPING:
+        # Aggregation graph accesses mapping by position: aggregation, mapping and their aggregation levels
+        return data.iloc[:, :4]
+    if sheet == ABBREVIATIONS:
+        return data[["abbreviations", "meaning"]].dropna(subset=["abbreviations"]).reset_index(drop=True)
+    return data
+
+
+def filter_processes(data: pd.DataFrame) -> pd.DataFrame:
+    """Returns a normalised process or helper set without the processes listed in PROCESS_FILTER."""
+    return data[~data["process"].str.contains("|".join(PROCESS_FILTER))].reset_index(drop=True)
+
+
+def read_workbook_sheets(path: pathlib.Path, sheets: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Reads and normalises multiple sheets of a structure workbook in a single pass.
+
+    The workbook is opened once in read-only mode, which streams rows instead of loading the whole workbook into
+    memory. Only columns listed in SHEET_COLUMNS are kept, other sheets are read completely. Sheets which do not
+    exist in the workbook are skipped.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        Path to the structure workbook.
+    sheets: list
+        Names of the sheets to read.
+
+    Returns
+    -------
+    dict
+        Normalised sheets keyed by sheet name.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        data = {}
+        for sheet in sheets:
+            if sheet not in workbook.sheetnames:
+                continue
+            rows = workbook[sheet].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            header = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+            columns = SHEET_COLUMNS.get(sheet, list(range(len(header))))
+            indices = [column if isinstance(column, int) else header.index(column) for column in columns]
+            # Use NaN for empty cells like pandas.read_excel does
+            records = [[np.nan if i >= len(row) or row[i] is None else row[i] for i in indices] for row in rows]
+            frame = pd.DataFrame.from_records(records, columns=[header[i] for i in indices])
+            frame = frame.dropna(how="all").reset_index(drop=True)
+            data[sheet] = normalise_sheet(sheet, frame)
+        return data
+    finally:
+        workbook.close()
+
+
+def write_sidecar_sheet(path: pathlib.Path, sheet: str, data: pd.DataFrame, version: Tuple[int, int]):
+    """
+    Publishes a normalised sheet as uncompressed Arrow IPC file next to the workbook.
+
+    The file is written to a temporary file first and swapped in atomically, so readers either see the previous or
+    the new version, never a partially written file. Processes which already mapped the previous version keep reading
+    it until they load the new one.
+    """
+    sidecar = get_sidecar_path(path, sheet)
+    sidecar.parent.mkdir(exist_ok=True)
+    data = data.set_axis([str(column) for column in data.columns], axis=1)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), SIDECAR_VERSION_KEY: get_sidecar_version(version)}
+    )
+    file_descriptor, temp_path = tempfile.mkstemp(dir=sidecar.parent, prefix=f".{sheet}.", suffix=".tmp")
+    os.close(file_descriptor)
+    try:
+        with ipc.new_file(temp_path, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temp_path, sidecar)
+    except BaseException:
+        pathlib.Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def read_sidecar_sheet(path: pathlib.Path, sheet: str, version: Tuple[int, int]) -> Optional[pd.DataFrame]:
+    """
+    Memory-maps a sheet from its sidecar file if it was compiled from the given workbook version.
+
+    String columns without missing values stay backed by the mapped Arrow buffers (zero-copy), so all processes on a
+    node share one copy of them in the page cache. Other columns are converted to regular pandas columns, as graph
+    functions rely on NaN for missing values.
+
+    Returns
+    -------
+    pd.DataFrame
+        The normalised sheet or None, if no up-to-date sidecar file exists.
+    """
+    sidecar = get_sidecar_path(path, sheet)
+    if pa is None or not sidecar.exists():
+        return None
+    try:
+        table = ipc.open_file(pa.memory_map(str(sidecar))).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if (table.schema.metadata or {}).get(SIDECAR_VERSION_KEY) != get_sidecar_version(version):
+        return None
+    return pd.DataFrame(
+        {
+            name: column.to_pandas(types_mapper=pd.ArrowDtype)
+            if pa.types.is_string(column.type) and column.null_count == 0
+            else column.to_pandas()
+            for name, column in zip(table.column_names, table.columns)
+        }
+    )
+
+
+def write_sidecar(path: pathlib.Path) -> pathlib.Path:
+    """
+    Compiles the structure sheets of a workbook into sidecar files next to the workbook.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        Path to the structure workbook.
+
+    Returns
+    -------
+    pathlib.Path
+        Folder holding the sidecar files.
+    """
+    if pa is None:
+        raise ImportError("Compiling structures requires pyarrow, install it via 'pip install pyarrow'.")
+    version = get_structure_version(path)
+    for sheet, data in read_workbook_sheets(path, STRUCTURE_SHEETS).items():
+        write_sidecar_sheet(path, sheet, data, version)
+    return path.with_suffix(SIDECAR_SUFFIX)
+
+
+def load_sheets(path: pathlib.Path, sheets: List[str], version: Tuple[int, int]) -> Dict[str, pd.DataFrame]:
+    """
+    Loads normalised sheets from their sidecar files if up-to-date, remaining sheets from the workbook itself.
+
+    Sheets parsed from the workbook are published as sidecar files, so that other worker processes map them instead
+    of parsing the workbook again.
+    """
+    data = {}
+    for sheet in sheets:
+        frame = read_sidecar_sheet(path, sheet, version)
+        if frame is not None:
+            data[sheet] = frame
+    missing = [sheet for sheet in sheets if sheet not in data]
+    if missing:
+        parsed = read_workbook_sheets(path, missing)
+        if pa is not None and settings.PUBLISH_STRUCTURES:
+            try:
+                for sheet, frame in parsed.items():
+                    write_sidecar_sheet(path, sheet, frame, version)
+                    # Continue with the mapped sheet, which shares memory with other processes
+                    shared = read_sidecar_sheet(path, sheet, version)
+                    if shared is not None:
+                        parsed[sheet] = shared
+            except OSError:
+                logger.warning(f"Could not publish sidecar files of structure '{path.stem}'.", exc_info=True)
+        data.update(parsed)
+    return data
+
+
+def read_sheets(structure_name: str, sheets: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Returns the requested, normalised sheets of a structure workbook.
+
+    Sheets are only loaded again if the workbook changed on disk since they were read last. If any sheet has to be
+    loaded, all structure sheets missing in the cache are loaded along with it in the same pass over the workbook, as
+    far as the workbook contains them.
+
+    Parameters
+    ----------
+    structure_name: str
+        Name of the structure workbook (without suffix) in the structures folder.
+    sheets: list
+        Names of the sheets to read.
+
+    Returns
+    -------
+    dict
+        Parsed sheets keyed by sheet name. The data frames are shared between requests and must not be modified.
+
+    Raises
+    ------
+    ValueError
+        If the workbook does not contain one of the requested sheets.
+    """
+    path = get_structure_path(structure_name)
+    version = get_structure_version(path)
+    keys = {sheet: (str(path), sheet, *version) for sheet in dict.fromkeys([*sheets, *STRUCTURE_SHEETS])}
+    data = {sheet: structure_cache.get(keys[sheet]) for sheet in sheets}
+    if any(frame is None for frame in data.values()):
+        # Load requested sheets along with all other structure sheets not cached yet in one pass over the workbook
+        missing = [sheet for sheet, frame in data.items() if frame is None]
+        missing += [sheet for sheet, key in keys.items() if sheet not in data and key not in structure_cache]
+        for sheet, frame in load_sheets(path, missing, version).items():
+            structure_cache.set(keys[sheet], frame)
+            if sheet in data:
+                data[sheet] = frame
+        absent = [sheet for sheet, frame in data.items() if frame is None]
+        if absent:
+            raise ValueError(f"Worksheet named '{absent[0]}' not found in structure '{structure_name}'.")
+    return data
+
+
+def read_sheet(structure_name: str, sheet: str) -> pd.DataFrame:
+    """Returns a single sheet of a structure workbook, see read_sheets."""
+    return read_sheets(structure_name, [sheet])[sheet]
+
+
+def get_derived(structure_name: str, name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Returns an object derived from a structure, which is built only once per workbook version.
+
+    Parameters
+    ----------
+    structure_name: str
+        Name of the structure workbook (without suffix) in the structures folder.
+    name: str
+        Name of the derived object, unique per kind of object and its parameters.
+    factory: Callable
+        Builds the object, called on first access and whenever the workbook changed.
+
+    Returns
+    -------
+    Any
+        The derived object. It is shared between requests and must not be modified.
+    """
+    path = get_structure_path(structure_name)
+    return derived_cache.get_or_set((str(path), name, *get_structure_version(path)), factory)
+
+
+def get_derived_path(structure_name: str, name: str, version: Tuple[int, int]) -> Optional[pathlib.Path]:
+    """Returns the path of a derived object stored in the cache folder, None if there is no cache folder."""
+    if settings.CACHE_DIR is None:
+        return None
+    file_name = "{}.v{}.{}_{}".format(name, CACHE_FORMAT, *version)
+    return pathlib.Path(settings.CACHE_DIR) / "structures" / structure_name / file_name
+
+
+def get_derived_bytes(structure_name: str, name: str, factory: Callable[[], bytes]) -> bytes:
+    """
+    Returns serialised data derived from a structure, cached in memory and in the cache folder per workbook version.
+
+    Other processes, like worker processes of the server, read the data from the cache folder instead of building it.
+    Files of previous workbook versions are removed when the data of a new version is stored.
+
+    Parameters
+    ----------
+    structure_name: str
+        Name of the structure workbook (without suffix) in the structures folder.
+    name: str
+        Name of the derived data, used as file name, unique per kind of data and its parameters.
+    factory: Callable
+        Builds the data, called if it is neither in memory nor in the cache folder.
+
+    Returns
+    -------
+    bytes
+        The derived data.
+    """
+    path = get_structure_path(structure_name)
+    version = get_structure_version(path)
+
+    def load() -> bytes:
+        derived_path = get_derived_path(structure_name, name, version)
+        if derived_path is not None and derived_path.exists():
+            try:
+                return derived_path.read_bytes()
+            except OSError:
+                pass
+        data = factory()
+        if derived_path is not None:
+            write_derived_file(derived_path, name, data)
+        return data
+
+    return derived_cache.get_or_set((str(path), name, *version), load)
+
+
+def write_derived_file(path: pathlib.Path, name: str, data: bytes):
+    """Stores derived data atomically and removes files of previous workbook versions holding the same data."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        for previous in path.parent.glob(f"{name}.*_*"):
+            if previous != path:
+                previous.unlink(missing_ok=True)
+    except OSError:
+        logger.warning(f"Could not store '{path.name}' in cache folder.", exc_info=True)
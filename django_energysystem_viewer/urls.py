@@ -9,10 +9,18 @@ urlpatterns = [
     path("energysystem/selection/", views.SelectionView.as_view(), name="selection"),
     path("energysystem/network/", views.network, name="networks"),
     path("energysystem/network_graph/", views.network_graph),
+    path("energysystem/network_graph_json/", views.network_graph_json, name="network_graph_json"),
+    path("energysystem/plotly.js", views.plotly_js, name="plotly_js"),
+    path("energysystem/layout_status/<str:key>/", views.layout_status, name="layout_status"),
+    path("energysystem/ego_network/", views.ego_network, name="ego_network"),
+    path("energysystem/reachability/", views.reachability, name="reachability"),
     path("energysystem/abbreviation_meaning/", views.abbreviation_meaning),
+    path("energysystem/abbreviation_autocomplete/", views.abbreviation_autocomplete, name="abbreviation_autocomplete"),
+    path("energysystem/abbreviation_decode/", views.abbreviation_decode, name="abbreviation_decode"),
     path("energysystem/aggregation/", views.AggregationView.as_view(), name="aggregations"),
     path("energysystem/aggregation_graph/", views.aggregation_graph),
     path("energysystem/lod_list/", views.write_lod_list, name="lod_list"),
+    path("energysystem/lod_lists/", views.write_lod_lists, name="lod_lists"),
     path("energysystem/processes/", views.ProcessesView.as_view(), name="processes"),
     path(
         "energysystem/process/<str:process_name>/data/",
@@ -1,14 +1,31 @@
-import io
+import json
+import math
+import tempfile
+from typing import Optional
 
 import pandas as pd
+import plotly
+import plotly.graph_objects as go
 from data_adapter import collection, preprocessing
 from data_adapter import settings as adapter_settings
 from django.http import FileResponse, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
 from django.views.generic import TemplateView
+from plotly.offline import get_plotlyjs
 
+from django_energysystem_viewer import abbreviations as abbr
 from django_energysystem_viewer import aggregation_graph as ag
+from django_energysystem_viewer import layouts
 from django_energysystem_viewer import network_graph as ng
+from django_energysystem_viewer import settings as app_settings
+from django_energysystem_viewer import structures
+from django_energysystem_viewer.aggregation_tree import AggregationTree
+from django_energysystem_viewer.nomenclature import NomenclatureTree
+from django_energysystem_viewer.reachability import DIRECTIONS as REACHABILITY_DIRECTIONS
+from django_energysystem_viewer.reachability import ReachabilityIndex
 
 
 class SelectionView(TemplateView):
@@ -26,28 +43,68 @@ class SelectionView(TemplateView):
 
 
 def get_excel_data(file: str, mode: str):
-    excel_filename = f"{file}.xlsx"
-    path = str(adapter_settings.STRUCTURES_DIR / excel_filename)
-    sheets = ["Process_Set", "Helper_Set", "Aggregation_Mapping", "Abbreviations"]
+    # Sheets are cached per workbook version, copies protect the cache from modifications in graph functions
     if mode == "network":
-        # Read the data from process_set and helper_set sheets
-        process_set = pd.read_excel(path, sheet_name=sheets[0])
-        helper_set = pd.read_excel(path, sheet_name=sheets[1])
-        # Select the relevant columns
-        process_set = process_set[["input", "process", "output"]]
-        helper_set = helper_set[["input", "process", "output"]]
-        # Concatenate the data from both sheets
-        complete_set = pd.concat([process_set, helper_set], ignore_index=True)
-        # Filter processes which should not appear in any graph feature
-        process_filter = ["x2x_import", "x2x_delivery", "helper_sink", "helper_pow_flow", "helper_co2"]
-        complete_set = complete_set[~complete_set["process"].str.contains("|".join(process_filter))]
-        return complete_set
+        # Sheets are already reduced to input, process and output
+        sheets = structures.read_sheets(file, [structures.PROCESS_SET, structures.HELPER_SET])
+        # Concatenate the data from both sheets and remove processes which should not appear in network graphs
+        complete_set = pd.concat([sheets[structures.PROCESS_SET], sheets[structures.HELPER_SET]], ignore_index=True)
+        return structures.filter_processes(complete_set)
     if mode == "aggregation":
-        process_set = pd.read_excel(path, sheet_name=sheets[0])
-        aggregation_mapping = pd.read_excel(path, sheet_name=sheets[2])
-        return process_set, aggregation_mapping
+        sheets = structures.read_sheets(file, [structures.PROCESS_SET, structures.AGGREGATION_MAPPING])
+        return sheets[structures.PROCESS_SET].copy(), sheets[structures.AGGREGATION_MAPPING].copy()
     if mode == "abbreviations":
-        return pd.read_excel(path, sheet_name=sheets[3])
+        return structures.read_sheet(file, structures.ABBREVIATIONS).copy()
+
+
+def get_aggregation_tree(structure_name: str) -> AggregationTree:
+    # Aggregation hierarchy is indexed once per workbook version instead of scanning the mapping per request
+    return structures.get_derived(
+        structure_name,
+        "aggregation_tree",
+        lambda: AggregationTree(structures.read_sheet(structure_name, structures.AGGREGATION_MAPPING)),
+    )
+
+
+def get_nomenclature_tree(structure_name: str) -> NomenclatureTree:
+    # Holds the grouped processes of all nomenclature levels, built once per workbook version
+    return structures.get_derived(
+        structure_name,
+        "nomenclature_tree",
+        lambda: NomenclatureTree(get_excel_data(structure_name, mode="network")),
+    )
+
+
+def get_structure_model(structure_name: str, nomenclature_level: int):
+    # Overview model per nomenclature level is built once per workbook version
+    return structures.get_derived(
+        structure_name,
+        f"structure_model_{nomenclature_level}",
+        lambda: ng.build_overview_model(
+            get_excel_data(structure_name, mode="network"),
+            nomenclature_level,
+            get_nomenclature_tree(structure_name),
+        ),
+    )
+
+
+def get_structure_index(structure_name: str):
+    # Exact name lookups of processes and commodities for process and commodity specific graphs
+    return structures.get_derived(
+        structure_name,
+        "structure_index",
+        lambda: ng.build_structure_index(get_excel_data(structure_name, mode="network")),
+    )
+
+
+def get_reachability_index(structure_name: str, nomenclature_level: int = None) -> ReachabilityIndex:
+    def build() -> ReachabilityIndex:
+        # Without nomenclature level, the index covers the ungrouped structure used by the reachability endpoint
+        if nomenclature_level is None:
+            return ReachabilityIndex(get_structure_index(structure_name))
+        return ReachabilityIndex(get_structure_model(structure_name, nomenclature_level))
+
+    return structures.get_derived(structure_name, f"reachability_index_{nomenclature_level}", build)
 
 
 def write_excel_data(data: pd.DataFrame, dir: str):
@@ -56,8 +113,7 @@ def write_excel_data(data: pd.DataFrame, dir: str):
 
 def network(request):
     structure_name = request.GET.get("structure")
-    abbreviations = get_excel_data("SEDOS-structure-all", "abbreviations")
-    abbreviation_list = abbreviations["abbreviations"].unique()
+    abbreviation_list = abbr.get_abbreviation_index("SEDOS-structure-all").abbreviations
     process_set = get_excel_data(structure_name, mode="network")
     unique_processes = process_set["process"].unique()
 
@@ -86,9 +142,7 @@ def network(request):
         request,
         "django_energysystem_viewer/network.html",
         {
-            "network_graph": ng.generate_Graph(
-                process_set, ["pow", "x2x"], "fr", "agg", None, None, nomenclature_level=None
-            ).to_html(config={"toImageButtonOptions": {"format": "svg"}}),
+            "plotly_version": plotly.__version__,
             "unique_processes": unique_processes,
             "unique_commodities": unique_commodities,
             "structure_name": structure_name,
@@ -97,8 +151,22 @@ def network(request):
     )
 
 
-def network_graph(request):
-    # # load the process set, change the path if necessary
+def get_time_budget(request) -> Optional[float]:
+    """Returns the layout time budget of a request, raises ValueError if the requested budget is invalid."""
+    time_budget = app_settings.LAYOUT_TIME_BUDGET
+    if not request.GET.get("time_budget"):
+        return time_budget
+    try:
+        requested = float(request.GET["time_budget"])
+    except ValueError:
+        raise ValueError("Time budget must be a number.") from None
+    if math.isnan(requested) or requested < 0:
+        raise ValueError("Time budget must not be negative.")
+    # Clients may only lower the layout time budget
+    return None if time_budget is None else min(requested, time_budget)
+
+
+def get_network_figure(request, time_budget: Optional[float]) -> go.Figure:
     structure_name = request.GET.get("structure")
     updated_process_set = get_excel_data(structure_name, mode="network")
     sectors = request.GET.getlist("sectors")
@@ -106,58 +174,173 @@ def network_graph(request):
     process = request.GET.get("process")
     commodity = request.GET.get("commodity")
     nomenclature_level = int(request.GET.get("nomenclature_level"))
-    # sep_agg = request.GET.get("seperate_join")
-    return HttpResponse(
-        ng.generate_Graph(
-            updated_process_set, sectors, mapping, "agg", process, commodity, nomenclature_level
-        ).to_html(config={"toImageButtonOptions": {"format": "svg"}})
+    render = request.GET.get("render", "auto")
+    highlight = request.GET.get("highlight")
+    highlight_direction = request.GET.get("highlight_direction", "both")
+    previous_sectors = request.GET.getlist("previous_sectors")
+    previous_layout = request.GET.get("previous_layout")
+    separate_commodities = request.GET.get("separate_commodities", "agg")
+    progressive = request.GET.get("progressive") == "1"
+    return ng.generate_Graph(
+        updated_process_set,
+        sectors,
+        mapping,
+        separate_commodities,
+        process,
+        commodity,
+        nomenclature_level,
+        structure_model=get_structure_model(structure_name, nomenclature_level),
+        render=render,
+        structure_index=get_structure_index(structure_name),
+        highlight=highlight,
+        highlight_direction=highlight_direction,
+        reachability=get_reachability_index(structure_name, nomenclature_level) if highlight else None,
+        previous_sectors=previous_sectors,
+        previous_layout=previous_layout,
+        time_budget=time_budget,
+        progressive=progressive,
     )
 
 
+def network_graph(request):
+    try:
+        time_budget = get_time_budget(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    figure = get_network_figure(request, time_budget)
+    return HttpResponse(figure.to_html(config={"toImageButtonOptions": {"format": "svg"}}))
+
+
+def network_graph_json(request):
+    try:
+        time_budget = get_time_budget(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    # Only traces and layout, the page renders them via Plotly.react using the separately cached plotly.js bundle
+    return HttpResponse(get_network_figure(request, time_budget).to_json(), content_type="application/json")
+
+
+@cache_control(public=True, max_age=60 * 60 * 24 * 365)
+@etag(lambda request: plotly.__version__)
+def plotly_js(request):
+    return HttpResponse(get_plotlyjs(), content_type="application/javascript")
+
+
+def layout_status(request, key):
+    # Polled by the network page while the layout of a draft is computed in the background
+    if not layouts.is_layout_key(key):
+        return JsonResponse({"error": "Invalid layout key."}, status=400)
+    status = layouts.get_layout_status(key)
+    if status is None:
+        return JsonResponse({"key": key, "status": "unknown"}, status=404)
+    return JsonResponse({"key": key, "status": status}, status=202 if status == "pending" else 200)
+
+
+def ego_network(request):
+    structure_name = request.GET.get("structure", "SEDOS-structure-all")
+    name = request.GET.get("node", "")
+    direction = request.GET.get("direction", "both")
+    try:
+        radius = int(request.GET.get("radius", 2))
+    except ValueError:
+        return JsonResponse({"error": "Radius must be an integer."}, status=400)
+    if not 0 <= radius <= ng.MAX_EGO_RADIUS:
+        return JsonResponse({"error": f"Radius must be between 0 and {ng.MAX_EGO_RADIUS}."}, status=400)
+    if direction not in ng.EGO_DIRECTIONS:
+        return JsonResponse({"error": f"Direction must be one of {', '.join(ng.EGO_DIRECTIONS)}."}, status=400)
+    structure_index = get_structure_index(structure_name)
+    if name not in structure_index.ids:
+        return JsonResponse({"error": f"Unknown process or commodity '{name}'."}, status=404)
+    return JsonResponse(ng.get_ego_network(structure_index, name, radius, direction))
+
+
+def reachability(request):
+    structure_name = request.GET.get("structure", "SEDOS-structure-all")
+    name = request.GET.get("node", "")
+    direction = request.GET.get("direction", "upstream")
+    if direction not in REACHABILITY_DIRECTIONS:
+        return JsonResponse({"error": f"Direction must be one of {', '.join(REACHABILITY_DIRECTIONS)}."}, status=400)
+    if name not in get_structure_index(structure_name).ids:
+        return JsonResponse({"error": f"Unknown process or commodity '{name}'."}, status=404)
+    cone = get_reachability_index(structure_name).query(name, direction)
+    return JsonResponse({"node": name, "direction": direction, **cone})
+
+
 class AggregationView(TemplateView):
     template_name = "django_energysystem_viewer/aggregation.html"
 
     def get_context_data(self, **kwargs):
         structure_name = "SEDOS-structure-all"
-        abbreviations = get_excel_data(structure_name, "abbreviations")
-        return {"structure_name": structure_name, "abbreviation_list": abbreviations["abbreviations"].unique()}
+        abbreviation_list = abbr.get_abbreviation_index(structure_name).abbreviations
+        return {"structure_name": structure_name, "abbreviation_list": abbreviation_list}
+
+
+def get_aggregation_elements(structure_name: str, sector: str) -> ag.AggregationElements:
+    # Elements and their subtree ranges are built once per sector and workbook version
+    def build():
+        df_process_set, df_aggregation_mapping = get_excel_data(structure_name, mode="aggregation")
+        process_list = list(df_process_set["process"].unique())
+        # Elements do not depend on the level of detail, which only selects the processes of LOD lists
+        nodes, edges = ag.generate_elements(
+            df_aggregation_mapping, None, sector, process_list, get_aggregation_tree(structure_name)
+        )
+        return ag.AggregationElements(nodes, edges, sector)
+
+    return structures.get_derived(structure_name, f"aggregation_elements_{sector}", build)
+
+
+def get_aggregation_json(structure_name: str, sector: str) -> bytes:
+    # Serialised response of the uncollapsed graph, shared by all worker processes via the cache folder
+    return structures.get_derived_bytes(
+        structure_name,
+        f"aggregation_graph_{sector}",
+        lambda: json.dumps({"elements": get_aggregation_elements(structure_name, sector).visible([])}).encode(),
+    )
 
 
 def aggregation_graph(request):
     sectors = request.GET["sectors"]
-    lod = int(request.GET["lod"])
-    df_process_set, df_aggregation_mapping = get_excel_data("SEDOS-structure-all", mode="aggregation")
-    process_list = list(df_process_set["process"].unique())
-    elements = ag.generate_aggregation_graph(df_aggregation_mapping, sectors, lod, process_list)
-    return JsonResponse({"elements": elements}, safe=False)
+    # Only elements outside of collapsed branches are sent and laid out
+    collapsed = request.GET.getlist("collapsed")
+    shown_sectors = request.GET.get("shown_sectors")
+    if not collapsed and shown_sectors != sectors and sectors in ag.AGGREGATION_SECTORS:
+        # Elements do not differ between LODs, the precomputed graph of the sector is served as is
+        return HttpResponse(get_aggregation_json("SEDOS-structure-all", sectors), content_type="application/json")
+    aggregation_elements = get_aggregation_elements("SEDOS-structure-all", sectors)
+    if shown_sectors == sectors:
+        # Client shows this sector already and only needs the changes, elements do not differ between LODs
+        delta = aggregation_elements.delta(request.GET.getlist("shown_collapsed"), collapsed)
+        return JsonResponse({"delta": delta})
+    return JsonResponse({"elements": aggregation_elements.visible(collapsed)}, safe=False)
+
+
+def lod_workbook_response(structure_name: str, lods: list, filename: str) -> FileResponse:
+    aggregation_elements = {
+        sector: get_aggregation_elements(structure_name, sector) for sector in ag.AGGREGATION_SECTORS
+    }
+    # The workbook is written to a temporary file and streamed from there in chunks instead of building it in memory
+    output = tempfile.TemporaryFile()
+    ag.write_lod_workbook(output, aggregation_elements, lods)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename)
 
 
 def write_lod_list(request):
     lod = int(request.GET["lod"])
-    df_process_set, df_aggregation_mapping = get_excel_data("SEDOS-structure-all", mode="aggregation")
-    process_list = list(df_process_set["process"].unique())
-    df_lod = ag.generate_df_lod(df_aggregation_mapping, lod, process_list)
-
-    # Use an in-memory BytesIO stream instead of saving to disk
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine="openpyxl")
-    df_lod.to_excel(writer, index=False)
-    writer.close()
-    output.seek(0)
+    # Holds the processes which are not aggregated any further only, like the list always did
+    return lod_workbook_response("SEDOS-structure-all", [], f"aggregations_lod_{lod}.xlsx")
+
 
-    # Create a file response
-    filename = f"aggregations_lod_{lod}.xlsx"
-    response = FileResponse(output, as_attachment=True, filename=filename)
-    return response
+def write_lod_lists(request):
+    return lod_workbook_response("SEDOS-structure-all", ag.AGGREGATION_LODS, "aggregations_lods.xlsx")
 
 
 def abbreviation_meaning(request):
     abb = request.GET.get("abbreviation")
     structure_name = "SEDOS-structure-all"
-    abbreviations = get_excel_data(structure_name, "abbreviations")
     if abb:
-        meaning = abbreviations[abbreviations["abbreviations"] == abb]["meaning"].values
-        if len(meaning) > 0:
+        meaning = abbr.get_abbreviation_index(structure_name).lookup(abb)
+        if meaning is not None:
             return HttpResponse("Meaning: " + meaning)
         else:
             return HttpResponse(["Abbreviation not found"])
@@ -165,6 +348,29 @@ def abbreviation_meaning(request):
         return HttpResponse("")
 
 
+def abbreviation_autocomplete(request):
+    prefix = request.GET.get("abbreviation", "")
+    try:
+        limit = int(request.GET.get("limit", 10))
+    except ValueError:
+        return JsonResponse({"error": "Limit must be an integer."}, status=400)
+    limit = min(max(limit, 1), abbr.MAX_COMPLETIONS)
+    structure_name = "SEDOS-structure-all"
+    matches = abbr.get_abbreviation_index(structure_name).complete(prefix, limit) if prefix else []
+    return JsonResponse({"abbreviations": matches})
+
+
+# Read-only lookup, posting names does not change any state and needs no CSRF token
+@csrf_exempt
+def abbreviation_decode(request):
+    # Long name lists can be posted to avoid exceeding the maximum URL length
+    names = request.POST.getlist("names") if request.method == "POST" else request.GET.getlist("names")
+    if len(names) > abbr.MAX_DECODE_NAMES:
+        return JsonResponse({"error": f"At most {abbr.MAX_DECODE_NAMES} names can be decoded at once."}, status=400)
+    structure_name = "SEDOS-structure-all"
+    return JsonResponse({"names": abbr.decode_names(structure_name, names)})
+
+
 class ProcessDetailMixin:
     def get_context_data(self, **kwargs):
         collection_name = self.request.GET["collection"]
@@ -199,8 +405,7 @@ class ProcessesView(ProcessDetailMixin, TemplateView):
         context["banner_data"] = collection_name
         structure_name = self.request.GET.get("structure")
         context["structure_name"] = structure_name
-        abbreviations = get_excel_data("SEDOS-structure-all", "abbreviations")
-        context["abbreviation_list"] = abbreviations["abbreviations"].unique()
+        context["abbreviation_list"] = abbr.get_abbreviation_index("SEDOS-structure-all").abbreviations
         return context
 
 
@@ -223,8 +428,7 @@ class ArtifactsView(TemplateView):
 
         structure_name = self.request.GET.get("structure")
         context["structure_name"] = structure_name
-        abbreviations = get_excel_data("SEDOS-structure-all", "abbreviations")
-        context["abbreviation_list"] = abbreviations["abbreviations"].unique()
+        context["abbreviation_list"] = abbr.get_abbreviation_index("SEDOS-structure-all").abbreviations
 
         # If specific artifact is queried
         artifact_name = self.request.GET.get("artifact")
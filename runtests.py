@@ -16,7 +16,8 @@ def runtests():
     if not settings.configured:
         # Configure test environment
         settings.configure(
-            DATABASES={"default": env.db("DATABASE_URL")},
+            # Tests do not use the database, which is only configured as Django requires it
+            DATABASES={"default": env.db("DATABASE_URL", default="sqlite://:memory:")},
             INSTALLED_APPS=(
                 "django.contrib.contenttypes",
                 "django.contrib.auth",
@@ -24,7 +25,7 @@ def runtests():
                 "django.contrib.sessions",
                 "django.contrib.messages",
                 "django.contrib.staticfiles",
-                "django_comparison_dashboard",
+                "django_energysystem_viewer",
             ),
             ROOT_URLCONF="",  # tests override urlconf, but it still needs to be defined
             MIDDLEWARE_CLASSES=(
@@ -54,7 +55,7 @@ def runtests():
     django.setup()
     failures = call_command(
         "test",
-        "tests.test_modex_source",
+        *(sys.argv[1:] or ["tests"]),
         interactive=False,
         failfast=False,
         verbosity=2,
@@ -0,0 +1,57 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer.abbreviations import AbbreviationIndex
+
+
+class AbbreviationIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = AbbreviationIndex(
+            pd.DataFrame(
+                {
+                    "abbreviations": ["pow", "PV", "pp", "hea", "pow", "ind"],
+                    "meaning": ["power", "photovoltaics", "power plant", "heat", "duplicate", None],
+                }
+            )
+        )
+
+    def test_lookup(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.abbreviations, ["pow", "PV", "pp", "hea", "ind"])
+        self.assertEqual(self.index.lookup("pow"), "power")
+        self.assertEqual(self.index.lookup("ind"), "")
+        self.assertIsNone(self.index.lookup("tra"))
+
+    def test_complete(self):
+        self.assertEqual(
+            self.index.complete("p"),
+            [
+                {"abbreviation": "pow", "meaning": "power"},
+                {"abbreviation": "pp", "meaning": "power plant"},
+                {"abbreviation": "PV", "meaning": "photovoltaics"},
+            ],
+        )
+
+    def test_complete_is_case_insensitive(self):
+        self.assertEqual([match["abbreviation"] for match in self.index.complete("pv")], ["PV"])
+        self.assertEqual([match["abbreviation"] for match in self.index.complete("PO")], ["pow"])
+
+    def test_complete_limit(self):
+        self.assertEqual([match["abbreviation"] for match in self.index.complete("p", limit=2)], ["pow", "pp"])
+        self.assertEqual(self.index.complete("p", limit=0), [])
+
+    def test_complete_without_matches(self):
+        self.assertEqual(self.index.complete("x"), [])
+        self.assertEqual(self.index.complete("zzz"), [])
+
+    def test_decode(self):
+        self.assertEqual(
+            self.index.decode(["pow_pp", "pow_pp", "hea_xyz"]),
+            {
+                "pow_pp": [
+                    {"abbreviation": "pow", "meaning": "power"},
+                    {"abbreviation": "pp", "meaning": "power plant"},
+                ],
+                "hea_xyz": [{"abbreviation": "hea", "meaning": "heat"}, {"abbreviation": "xyz", "meaning": None}],
+            },
+        )
@@ -0,0 +1,106 @@
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer.aggregation_graph import AggregationElements, element_key
+
+
+def node(node_id, level, collapsible=True):
+    return {
+        "data": {"id": node_id, "label": node_id},
+        "position": {"x": 0, "y": 0},
+        "classes": "aggregation_level_0",
+        "collapsible": collapsible,
+        "level_of_detail": level,
+    }
+
+
+def edge(source, target):
+    return {"data": {"source": source, "target": target}}
+
+
+class AggregationElementsTest(SimpleTestCase):
+    def setUp(self):
+        # pow -> a -> a1 -> a11, a -> a2 and pow -> b
+        self.elements = AggregationElements(
+            [node("pow", 0), node("a", 1), node("a1", 2), node("a11", 3), node("a2", 2, False), node("b", 1, False)],
+            [edge("pow", "a"), edge("a", "a1"), edge("a1", "a11"), edge("a", "a2"), edge("pow", "b")],
+            "pow",
+        )
+
+    def keys(self, elements):
+        return [element_key(element) for element in elements]
+
+    def test_subtree_ranges(self):
+        self.assertEqual(self.elements.start, {"pow": 0, "a": 1, "a1": 2, "a11": 3, "a2": 4, "b": 5})
+        self.assertEqual(self.elements.end, {"a11": 4, "a1": 4, "a2": 5, "a": 5, "b": 6, "pow": 6})
+
+    def test_visible_without_collapsed_nodes(self):
+        visible = self.elements.visible([])
+        self.assertEqual(
+            self.keys(visible),
+            ["pow", "a", "a1", "a11", "a2", "b", ("pow", "a"), ("a", "a1"), ("a1", "a11"), ("a", "a2"), ("pow", "b")],
+        )
+        self.assertTrue(all(e["classes"].endswith(" not-collapsed") for e in visible if "id" in e["data"]))
+
+    def test_visible_hides_descendants(self):
+        visible = self.elements.visible(["a"])
+        self.assertEqual(self.keys(visible), ["pow", "a", "b", ("pow", "a"), ("pow", "b")])
+        self.assertEqual(visible[1]["classes"], "aggregation_level_0 collapsed")
+
+    def test_visible_nested_collapsed_nodes(self):
+        self.assertEqual(self.keys(self.elements.visible(["a1", "a"])), self.keys(self.elements.visible(["a"])))
+        self.assertEqual(
+            self.keys(self.elements.visible(["a1"])),
+            ["pow", "a", "a1", "a2", "b", ("pow", "a"), ("a", "a1"), ("a", "a2"), ("pow", "b")],
+        )
+
+    def test_visible_ignores_unknown_nodes(self):
+        self.assertEqual(self.elements.visible(["unknown"]), self.elements.visible([]))
+
+    def test_visible_does_not_modify_nodes(self):
+        self.elements.visible(["a"])
+        self.assertEqual(self.elements.nodes[1]["classes"], "aggregation_level_0")
+
+    def test_visible_leaf_is_not_collapsible(self):
+        visible = self.elements.visible(["b"])
+        self.assertEqual(len(visible), 11)
+        self.assertEqual(visible[5]["classes"], "aggregation_level_0 not-collapsed")
+
+    def test_delta_collapse(self):
+        delta = self.elements.delta([], ["a"])
+        self.assertEqual(delta["add"], [])
+        # Edges of removed nodes are removed along with them
+        self.assertEqual(
+            delta["remove"], [{"id": "a1", "label": "a1"}, {"id": "a11", "label": "a11"}, {"id": "a2", "label": "a2"}]
+        )
+        self.assertEqual(delta["restyle"], [{"id": "a", "classes": "aggregation_level_0 collapsed"}])
+
+    def test_delta_expand(self):
+        delta = self.elements.delta(["a"], [])
+        self.assertEqual(self.keys(delta["add"]), ["a1", "a11", "a2", ("a", "a1"), ("a1", "a11"), ("a", "a2")])
+        self.assertEqual(delta["add"][0]["position"], {"x": 0, "y": 0})
+        self.assertEqual(delta["remove"], [])
+        self.assertEqual(delta["restyle"], [{"id": "a", "classes": "aggregation_level_0 not-collapsed"}])
+
+    def test_delta_applied_to_shown_elements(self):
+        for shown, collapsed in ((["a1"], ["a"]), (["a"], ["a1"]), (["a", "b"], []), ([], [])):
+            with self.subTest(shown=shown, collapsed=collapsed):
+                elements = {element_key(e): e for e in self.elements.visible(shown)}
+                delta = self.elements.delta(shown, collapsed)
+                for data in delta["remove"]:
+                    key = data.get("id") or (data["source"], data["target"])
+                    del elements[key]
+                # Edges of removed nodes are removed along with the nodes, like cytoscape does
+                elements = {key: e for key, e in elements.items() if isinstance(key, str) or set(key) <= set(elements)}
+                for restyle in delta["restyle"]:
+                    elements[restyle["id"]] = {**elements[restyle["id"]], "classes": restyle["classes"]}
+                elements.update((element_key(e), e) for e in delta["add"])
+                expected = {element_key(e): e for e in self.elements.visible(collapsed)}
+                self.assertEqual(elements, expected)
+
+    def test_leaf_processes(self):
+        self.assertEqual(self.elements.leaf_processes(), ["a11", "a2", "b"])
+
+    def test_lod_processes(self):
+        self.assertEqual(self.elements.lod_processes(1), ["a", "b"])
+        self.assertEqual(self.elements.lod_processes(2), ["a1", "a2", "b"])
+        self.assertEqual(self.elements.lod_processes(3), self.elements.leaf_processes())
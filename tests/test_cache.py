@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer.cache import LRUCache
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_get_or_set(self):
+        cache = LRUCache(maxsize=2)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(cache.get_or_set("key", factory), "value")
+        self.assertEqual(cache.get_or_set("key", factory), "value")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.info(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 2})
+
+    def test_get_default(self):
+        cache = LRUCache(maxsize=1)
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.get("missing", 0), 0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_clear(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.info(), {"hits": 0, "misses": 0, "size": 0, "maxsize": 2})
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import igraph as ig
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer import layouts
+from django_energysystem_viewer import network_graph as ng
+from django_energysystem_viewer.structure_model import StructureModel
+
+
+def get_coords(graph, algorithm, seed):
+    return np.asarray(ng.compute_layout(graph, algorithm, seed).coords)
+
+
+class SeededLayoutTest(SimpleTestCase):
+    def setUp(self):
+        self.graph = ig.Graph.Lattice([6, 6], circular=False)
+
+    def test_same_seed_same_coordinates_across_threads(self):
+        expected = get_coords(self.graph, "fr", 42)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: get_coords(self.graph, "fr", 42), range(8)))
+        for coords in results:
+            np.testing.assert_array_equal(coords, expected)
+
+    def test_different_seeds_different_coordinates(self):
+        self.assertFalse(np.array_equal(get_coords(self.graph, "fr", 1), get_coords(self.graph, "fr", 2)))
+
+    def test_get_layout_is_deterministic(self):
+        with mock.patch.object(layouts.settings, "CACHE_DIR", None):
+            layouts.layout_cache.clear()
+            first = layouts.get_layout(self.graph, "kk", ng.compute_layout, seed=7)
+            layouts.layout_cache.clear()
+            second = layouts.get_layout(self.graph, "kk", ng.compute_layout, seed=7)
+        self.assertEqual(first.coords, second.coords)
+
+
+class LayoutKeyTest(SimpleTestCase):
+    def setUp(self):
+        self.graph = ig.Graph.Lattice([4, 4], circular=False)
+        self.key = layouts.get_layout_key(self.graph, "fr", 1)
+
+    def test_key_is_stable(self):
+        self.assertEqual(layouts.get_layout_key(self.graph, "fr", 1), self.key)
+        self.assertTrue(layouts.is_layout_key(self.key))
+
+    def test_key_changes_with_algorithm(self):
+        self.assertNotEqual(layouts.get_layout_key(self.graph, "kk", 1), self.key)
+
+    def test_key_changes_with_seed(self):
+        self.assertNotEqual(layouts.get_layout_key(self.graph, "fr", 2), self.key)
+
+    def test_key_changes_with_initial_coordinates(self):
+        initial = np.zeros((self.graph.vcount(), 2))
+        warm_key = layouts.get_layout_key(self.graph, "fr", 1, initial)
+        self.assertNotEqual(warm_key, self.key)
+        initial[0] = 1.0
+        self.assertNotEqual(layouts.get_layout_key(self.graph, "fr", 1, initial), warm_key)
+
+    def test_key_changes_with_graph(self):
+        graph = self.graph.copy()
+        graph.delete_edges([0])
+        self.assertNotEqual(layouts.get_layout_key(graph, "fr", 1), self.key)
+
+
+class SectorLayoutTest(SimpleTestCase):
+    def setUp(self):
+        process_set = pd.DataFrame(
+            {
+                "process": ["pow_pp", "pow_wind", "hea_hp", "hea_boiler"],
+                "input": ["sec_gas", "", "sec_elec", "sec_gas"],
+                "output": ["sec_elec", "sec_elec", "sec_heat", "sec_heat"],
+            }
+        )
+        self.structure_model = StructureModel.from_process_set(process_set)
+        for patcher in [
+            mock.patch.object(layouts.settings, "CACHE_DIR", None),
+            # Layouts refined in the background are not computed, so that no process pool is started
+            mock.patch.object(layouts, "refine_layout", side_effect=lambda graph, algorithm, compute, seed, key: key),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        layouts.layout_cache.clear()
+        self.addCleanup(layouts.layout_cache.clear)
+
+    def get_cold_key(self, sectors, algorithm):
+        model = self.structure_model.subgraph(sectors)
+        graph = ig.Graph(n=len(model), edges=model.edges)
+        return layouts.get_layout_key(graph, algorithm, ng.app_settings.LAYOUT_SEED)
+
+    def generate(self, sectors, algorithm="kk", previous_layout=None, **kwargs):
+        previous_sectors = ["pow"] if previous_layout else None
+        _, _, meta = ng.generate_sector_layout(
+            self.structure_model, sectors, algorithm, previous_sectors, previous_layout, **kwargs
+        )
+        return meta
+
+    def test_warm_start(self):
+        previous = self.generate(["pow"])
+        meta = self.generate(["pow", "hea"], previous_layout=previous["layout_key"])
+        self.assertNotEqual(meta["layout_key"], self.get_cold_key(["pow", "hea"], "kk"))
+
+    def test_cached_layout_is_served_instead_of_warm_start(self):
+        cold = self.generate(["pow", "hea"])
+        previous = self.generate(["pow"])
+        meta = self.generate(["pow", "hea"], previous_layout=previous["layout_key"])
+        self.assertEqual(meta["layout_key"], cold["layout_key"])
+
+    def test_draft_is_not_warm_started_from(self):
+        with mock.patch.object(ng.app_settings, "PROGRESSIVE_LAYOUT_SECONDS", 0):
+            draft = self.generate(["pow"], progressive=True)
+        self.assertEqual(draft["layout_algorithm"], "draft")
+        meta = self.generate(["pow", "hea"], previous_layout=draft["layout_key"])
+        self.assertEqual(meta["layout_key"], self.get_cold_key(["pow", "hea"], "kk"))
+
+    def test_warm_start_within_time_budget(self):
+        previous = self.generate(["pow"])
+        meta = self.generate(["pow", "hea"], previous_layout=previous["layout_key"], time_budget=0)
+        self.assertEqual(meta["layout_algorithm"], "fr_grid")
+        self.assertNotEqual(meta["layout_key"], self.get_cold_key(["pow", "hea"], "fr_grid"))
+
+    def test_warm_start_is_progressive(self):
+        previous = self.generate(["pow"])
+        with mock.patch.object(ng.app_settings, "PROGRESSIVE_LAYOUT_SECONDS", 0):
+            meta = self.generate(["pow", "hea"], previous_layout=previous["layout_key"], progressive=True)
+        self.assertEqual(meta["layout_algorithm"], "draft")
+        self.assertEqual(meta["refining"], self.get_cold_key(["pow", "hea"], "kk"))
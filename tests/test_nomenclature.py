@@ -0,0 +1,54 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer.nomenclature import NomenclatureTree, split
+
+
+class NomenclatureTreeTest(SimpleTestCase):
+    def setUp(self):
+        self.tree = NomenclatureTree(
+            pd.DataFrame(
+                {
+                    "input": ["sec_gas", "sec_coal", "sec_elec", "sec_gas"],
+                    "process": ["pow_combustion_gt", "pow_combustion_st", "hea_hp", "pow_combustion"],
+                    "output": ["sec_elec", "sec_elec,sec_heat", "sec_heat", ""],
+                }
+            )
+        )
+
+    def test_split(self):
+        self.assertEqual(split("sec_elec,,sec_heat"), ["sec_elec", "sec_heat"])
+        self.assertEqual(split(float("nan")), [])
+
+    def test_max_depth(self):
+        self.assertEqual(self.tree.max_depth, 3)
+
+    def test_groups_full_names(self):
+        self.assertEqual(
+            self.tree.groups(None),
+            [
+                ("hea_hp", ["sec_elec"], ["sec_heat"]),
+                ("pow_combustion", ["sec_gas"], []),
+                ("pow_combustion_gt", ["sec_gas"], ["sec_elec"]),
+                ("pow_combustion_st", ["sec_coal"], ["sec_elec", "sec_heat"]),
+            ],
+        )
+        self.assertEqual(self.tree.groups(10), self.tree.groups(None))
+
+    def test_groups_combine_subtrees(self):
+        self.assertEqual(
+            self.tree.groups(2),
+            [
+                ("hea_hp", ["sec_elec"], ["sec_heat"]),
+                ("pow_combustion", ["sec_coal", "sec_gas"], ["sec_elec", "sec_heat"]),
+            ],
+        )
+        self.assertEqual(
+            self.tree.groups(1),
+            [("hea", ["sec_elec"], ["sec_heat"]), ("pow", ["sec_coal", "sec_gas"], ["sec_elec", "sec_heat"])],
+        )
+
+    def test_process_set(self):
+        process_set = self.tree.process_set(2)
+        self.assertEqual(list(process_set.columns), ["process", "input", "output"])
+        self.assertEqual(process_set.iloc[1].tolist(), ["pow_combustion", "sec_coal,sec_gas", "sec_elec,sec_heat"])
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer.reachability import ReachabilityIndex
+from django_energysystem_viewer.structure_model import StructureModel
+
+
+class ReachabilityIndexTest(SimpleTestCase):
+    def setUp(self):
+        # Storage feeds back into its own input commodity, which forms a cycle
+        self.model = StructureModel.from_process_set(
+            pd.DataFrame(
+                {
+                    "input": ["sec_gas", "sec_elec", "sec_elec", "sec_h2"],
+                    "process": ["pow_gt", "pow_storage", "x2x_electrolysis", "ind_steel"],
+                    "output": ["sec_elec", "sec_elec", "sec_h2", "sec_steel"],
+                }
+            )
+        )
+        self.index = ReachabilityIndex(self.model)
+
+    def test_downstream(self):
+        self.assertEqual(
+            self.index.query("pow_gt", "downstream"),
+            {
+                "processes": ["ind_steel", "pow_gt", "pow_storage", "x2x_electrolysis"],
+                "commodities": ["sec_elec", "sec_h2", "sec_steel"],
+            },
+        )
+
+    def test_upstream(self):
+        self.assertEqual(
+            self.index.query("x2x_electrolysis", "upstream"),
+            {"processes": ["pow_gt", "pow_storage", "x2x_electrolysis"], "commodities": ["sec_elec", "sec_gas"]},
+        )
+
+    def test_cycle_reaches_itself(self):
+        upstream = self.index.query("sec_elec", "upstream")
+        downstream = self.index.query("sec_elec", "downstream")
+        self.assertIn("pow_storage", upstream["processes"])
+        self.assertIn("pow_storage", downstream["processes"])
+
+    def test_both(self):
+        both = self.index.cone("x2x_electrolysis", "both")
+        expected = self.index.cone("x2x_electrolysis", "upstream") | self.index.cone("x2x_electrolysis", "downstream")
+        np.testing.assert_array_equal(both, expected)
+        self.assertEqual(both.sum(), len(self.model))
+
+    def test_unknown_node(self):
+        self.assertFalse(self.index.cone("unknown", "both").any())
+
+    def test_matches_breadth_first_search(self):
+        graph = self.model.graph
+        for node_id, name in enumerate(self.model.names):
+            for direction, mode in (("downstream", "out"), ("upstream", "in")):
+                expected = np.zeros(len(self.model), dtype=bool)
+                expected[graph.subcomponent(node_id, mode=mode)] = True
+                np.testing.assert_array_equal(self.index.cone(name, direction), expected)
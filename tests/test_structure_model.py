@@ -0,0 +1,162 @@
+import pathlib
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer import network_graph as ng
+from django_energysystem_viewer import structures
+from django_energysystem_viewer.structure_model import SECTORS, StructureModel, split_commodities
+
+STRUCTURE_PATH = pathlib.Path(__file__).parent / "SEDOS_Modellstruktur.xlsx"
+
+
+def baseline_nodes_and_edges(
+    process_set: pd.DataFrame, selected_sectors: List[str], nomenclature_level: int
+) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Nodes and edges of the network overview as built before the structure model, kept as reference."""
+    process_set = process_set.copy()
+    process_set["process_trimmed"] = process_set["process"].apply(
+        lambda x: "_".join(x.split("_")[:nomenclature_level])
+    )
+    grouped = (
+        process_set.groupby("process_trimmed")
+        .agg(
+            {
+                "input": lambda x: ",".join(map(str, filter(pd.notna, x))),
+                "output": lambda x: ",".join(map(str, filter(pd.notna, x))),
+            }
+        )
+        .reset_index()
+        .rename(columns={"process_trimmed": "process"})
+    )
+    grouped["input"] = grouped["input"].apply(lambda x: ",".join(sorted(set(x.split(",")))))
+    grouped["output"] = grouped["output"].apply(lambda x: ",".join(sorted(set(x.split(",")))))
+    filtered = pd.concat(
+        [grouped[grouped["process"].str.startswith(sector)] for sector in SECTORS if sector in selected_sectors]
+    )
+
+    nodes, edges = [], []
+    for inputs, process, outputs in zip(filtered["input"], filtered["process"], filtered["output"]):
+
+        def clean(value):
+            names = [item.strip().replace("[", "").replace("]", "").strip().replace("_orig", "") for item in value]
+            return [name for name in names if name and not name.startswith("emi")]
+
+        input_list = clean(inputs.split(",") if isinstance(inputs, str) else [])
+        output_list = clean(outputs.split(",") if isinstance(outputs, str) else [])
+        process_list = [item.strip().replace("[", "").replace("]", "") for item in process.split(",")]
+        for node in input_list + process_list + output_list:
+            if node not in nodes:
+                nodes.append(node)
+        edges += [(nodes.index(i), nodes.index(p)) for i in input_list for p in process_list]
+        edges += [(nodes.index(p), nodes.index(o)) for p in process_list for o in output_list]
+    return nodes, edges
+
+
+class SplitCommoditiesTest(SimpleTestCase):
+    def test_split(self):
+        self.assertEqual(split_commodities("[sec_elec, sec_elec_orig]"), ["sec_elec", "sec_elec_orig"])
+        self.assertEqual(split_commodities("[sec_elec, sec_elec_orig]", merge_orig=True), ["sec_elec", "sec_elec"])
+        self.assertEqual(split_commodities("sec_elec,emi_co2", exclude_prefixes=("emi",)), ["sec_elec"])
+        self.assertEqual(split_commodities(np.nan), [])
+        self.assertEqual(split_commodities(" , "), [])
+
+
+class StructureModelTest(SimpleTestCase):
+    def setUp(self):
+        self.process_set = pd.DataFrame(
+            {
+                "input": ["sec_gas", "sec_gas", "sec_elec", "sec_heat"],
+                "process": ["pow_gt", "pow_gt", "hea_hp", "ind_steel"],
+                "output": ["sec_elec,sec_heat", "sec_elec", "sec_heat", "emi_co2"],
+            }
+        )
+        self.model = StructureModel.from_process_set(self.process_set)
+
+    def named_edges(self, model):
+        return [(model.names[s], model.names[t]) for s, t in model.edges]
+
+    def test_nodes(self):
+        self.assertEqual(
+            self.model.names, ["sec_gas", "pow_gt", "sec_elec", "sec_heat", "hea_hp", "ind_steel", "emi_co2"]
+        )
+        self.assertEqual(self.model.processes, {"pow_gt", "hea_hp", "ind_steel"})
+        self.assertEqual(self.model.sectors.tolist(), [-1, 0, -1, -1, 4, 2, -1])
+
+    def test_parallel_edges_are_collapsed(self):
+        self.assertEqual(
+            self.named_edges(self.model),
+            [
+                ("sec_gas", "pow_gt"),
+                ("pow_gt", "sec_elec"),
+                ("pow_gt", "sec_heat"),
+                ("sec_elec", "hea_hp"),
+                ("hea_hp", "sec_heat"),
+                ("sec_heat", "ind_steel"),
+                ("ind_steel", "emi_co2"),
+            ],
+        )
+        self.assertEqual(self.model.weights.tolist(), [2, 2, 1, 1, 1, 1, 1])
+
+    def test_adjacency(self):
+        heat = self.model.ids["sec_heat"]
+        self.assertEqual(
+            sorted(self.model.predecessors(heat).tolist()), [self.model.ids["pow_gt"], self.model.ids["hea_hp"]]
+        )
+        self.assertEqual(self.model.successors(heat).tolist(), [self.model.ids["ind_steel"]])
+        self.assertEqual(self.model.successors(self.model.ids["emi_co2"]).tolist(), [])
+        self.assertEqual(self.model.producers("sec_heat"), ["pow_gt", "hea_hp"])
+        self.assertEqual(self.model.consumers("sec_elec"), ["hea_hp"])
+        self.assertEqual(self.model.inputs("pow_gt"), ["sec_gas"])
+        self.assertEqual(self.model.outputs("pow_gt"), ["sec_elec", "sec_heat"])
+        self.assertEqual(self.model.outputs("unknown"), [])
+
+    def test_find_processes(self):
+        self.assertEqual(self.model.find_processes("pow_gt"), [self.model.ids["pow_gt"]])
+        self.assertEqual(self.model.find_processes("h"), [self.model.ids["hea_hp"]])
+        self.assertEqual(self.model.find_processes("sec_gas"), [])
+
+    def test_subgraph(self):
+        subgraph = self.model.subgraph(["hea", "ind"])
+        self.assertEqual(subgraph.names, ["sec_elec", "sec_heat", "hea_hp", "ind_steel", "emi_co2"])
+        self.assertEqual(
+            self.named_edges(subgraph),
+            [("sec_elec", "hea_hp"), ("hea_hp", "sec_heat"), ("sec_heat", "ind_steel"), ("ind_steel", "emi_co2")],
+        )
+        self.assertEqual(subgraph.graph.vcount(), 5)
+        self.assertEqual(subgraph.graph.ecount(), 4)
+
+
+class OverviewRegressionTest(SimpleTestCase):
+    """Compares the network overview with the nodes and edges built before the structure model."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        sheets = structures.read_workbook_sheets(STRUCTURE_PATH, [structures.PROCESS_SET, structures.HELPER_SET])
+        cls.process_set = structures.filter_processes(
+            pd.concat([sheets[structures.PROCESS_SET], sheets[structures.HELPER_SET]], ignore_index=True)
+        )
+        raw = pd.concat(
+            [
+                pd.read_excel(STRUCTURE_PATH, sheet_name=sheet)[["input", "process", "output"]]
+                for sheet in (structures.PROCESS_SET, structures.HELPER_SET)
+            ],
+            ignore_index=True,
+        ).dropna(subset=["process"])
+        cls.raw_process_set = raw[~raw["process"].str.contains("|".join(structures.PROCESS_FILTER))]
+
+    def test_subgraph_matches_baseline(self):
+        for nomenclature_level in (20, 3, 2):
+            model = ng.build_overview_model(self.process_set, nomenclature_level)
+            for sectors in (["pow"], ["hea", "ind"], SECTORS):
+                with self.subTest(nomenclature_level=nomenclature_level, sectors=sectors):
+                    nodes, edges = baseline_nodes_and_edges(self.raw_process_set, sectors, nomenclature_level)
+                    subgraph = model.subgraph(sectors)
+                    self.assertEqual(set(subgraph.names), set(nodes))
+                    self.assertEqual(
+                        {(subgraph.names[s], subgraph.names[t]) for s, t in subgraph.edges},
+                        {(nodes[s], nodes[t]) for s, t in edges},
+                    )
@@ -0,0 +1,90 @@
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from django_energysystem_viewer import structures
+
+STRUCTURE_PATH = pathlib.Path(__file__).parent / "SEDOS_Modellstruktur.xlsx"
+
+
+def normalise_missing(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype(object).map(lambda value: None if pd.isna(value) else value)
+
+
+class StructureCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.folder = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.folder)
+        patcher = mock.patch.object(structures.adapter_settings, "STRUCTURES_DIR", self.folder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(structures.structure_cache.clear)
+        self.addCleanup(structures.derived_cache.clear)
+
+    def test_read_sheets_invalidated_by_modification_time(self):
+        path = self.folder / "structure.xlsx"
+        shutil.copy(STRUCTURE_PATH, path)
+        with mock.patch.object(structures.settings, "PUBLISH_STRUCTURES", False):
+            first = structures.read_sheet("structure", structures.PROCESS_SET)
+            self.assertIs(structures.read_sheet("structure", structures.PROCESS_SET), first)
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            second = structures.read_sheet("structure", structures.PROCESS_SET)
+        self.assertIsNot(second, first)
+        pd.testing.assert_frame_equal(second, first)
+
+    def test_get_derived_invalidated_by_modification_time_and_size(self):
+        path = self.folder / "structure.xlsx"
+        path.write_bytes(b"version 1")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(structures.get_derived("structure", "derived", factory), 1)
+        self.assertEqual(structures.get_derived("structure", "derived", factory), 1)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(structures.get_derived("structure", "derived", factory), 2)
+        # Same modification time, but different size
+        mtime = path.stat().st_mtime_ns
+        path.write_bytes(b"version 22")
+        os.utime(path, ns=(mtime, mtime))
+        self.assertEqual(structures.get_derived("structure", "derived", factory), 3)
+        self.assertEqual(structures.get_derived("structure", "other", factory), 4)
+
+    def test_missing_sheet(self):
+        shutil.copy(STRUCTURE_PATH, self.folder / "structure.xlsx")
+        with self.assertRaises(ValueError):
+            structures.read_sheet("structure", "Unknown_Sheet")
+
+
+@unittest.skipIf(structures.pa is None, "pyarrow is not installed")
+class SidecarTest(SimpleTestCase):
+    def setUp(self):
+        folder = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, folder)
+        self.path = folder / "structure.xlsx"
+        shutil.copy(STRUCTURE_PATH, self.path)
+
+    def test_round_trip(self):
+        structures.write_sidecar(self.path)
+        version = structures.get_structure_version(self.path)
+        for sheet, expected in structures.read_workbook_sheets(self.path, structures.STRUCTURE_SHEETS).items():
+            with self.subTest(sheet=sheet):
+                frame = structures.read_sidecar_sheet(self.path, sheet, version)
+                expected = expected.set_axis([str(column) for column in expected.columns], axis=1)
+                # Missing strings are None in sidecar files and NaN in parsed sheets
+                pd.testing.assert_frame_equal(normalise_missing(frame), normalise_missing(expected))
+
+    def test_outdated_sidecar_is_ignored(self):
+        structures.write_sidecar(self.path)
+        mtime, size = structures.get_structure_version(self.path)
+        self.assertIsNone(structures.read_sidecar_sheet(self.path, structures.PROCESS_SET, (mtime + 1, size)))
@@ -0,0 +1,59 @@
+from unittest import mock
+
+import plotly.graph_objects as go
+from django.test import Client, SimpleTestCase, override_settings
+
+from django_energysystem_viewer import abbreviations as abbr
+from django_energysystem_viewer import views
+
+
+@override_settings(
+    ROOT_URLCONF="django_energysystem_viewer.urls",
+    MIDDLEWARE=["django.middleware.csrf.CsrfViewMiddleware"],
+)
+class AbbreviationDecodeViewTest(SimpleTestCase):
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        patcher = mock.patch.object(abbr, "decode_names", side_effect=lambda structure, names: dict.fromkeys(names))
+        self.decode_names = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get(self):
+        response = self.client.get("/energysystem/abbreviation_decode/", {"names": ["pow_pp", "hea_hp"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"names": {"pow_pp": None, "hea_hp": None}})
+
+    def test_post_without_csrf_token(self):
+        response = self.client.post("/energysystem/abbreviation_decode/", {"names": ["pow_pp"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"names": {"pow_pp": None}})
+
+    def test_too_many_names(self):
+        names = [f"pow_{i}" for i in range(abbr.MAX_DECODE_NAMES + 1)]
+        response = self.client.post("/energysystem/abbreviation_decode/", {"names": names})
+        self.assertEqual(response.status_code, 400)
+        self.decode_names.assert_not_called()
+
+
+@override_settings(ROOT_URLCONF="django_energysystem_viewer.urls")
+class NetworkGraphTimeBudgetTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(views, "get_network_figure", return_value=go.Figure())
+        self.get_network_figure = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_time_budget(self):
+        for time_budget in ["abc", "-1", "nan"]:
+            with self.subTest(time_budget=time_budget):
+                response = self.client.get("/energysystem/network_graph_json/", {"time_budget": time_budget})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.get_network_figure.assert_not_called()
+
+    def test_time_budget_is_capped(self):
+        with mock.patch.object(views.app_settings, "LAYOUT_TIME_BUDGET", 10.0):
+            for time_budget, expected in [("2.5", 2.5), ("100", 10.0), ("", 10.0)]:
+                with self.subTest(time_budget=time_budget):
+                    response = self.client.get("/energysystem/network_graph_json/", {"time_budget": time_budget})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(self.get_network_figure.call_args.args[1], expected)